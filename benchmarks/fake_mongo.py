@@ -0,0 +1,257 @@
+"""In-process stand-in for the motor collections the bot uses.
+
+Only the subset of the query/update language the bot relies on is
+implemented. Every call is counted so benchmarks can report Mongo ops
+per request without a server.
+"""
+import copy
+from collections import Counter
+from types import SimpleNamespace
+from bson import ObjectId
+from pymongo.errors import InvalidOperation
+
+ops = Counter()
+
+def _get(doc, path):
+    for part in path.split("."):
+        if not isinstance(doc, dict):
+            return None
+        doc = doc.get(part)
+    return doc
+
+def _match_value(value, condition):
+    if isinstance(condition, dict) and condition and all(k.startswith("$") for k in condition):
+        for op, arg in condition.items():
+            if op == "$in" and value not in arg:
+                return False
+            if op == "$nin" and value in arg:
+                return False
+            if op == "$ne" and value == arg:
+                return False
+            if op == "$lt" and not (value is not None and value < arg):
+                return False
+            if op == "$lte" and not (value is not None and value <= arg):
+                return False
+            if op == "$gt" and not (value is not None and value > arg):
+                return False
+            if op == "$gte" and not (value is not None and value >= arg):
+                return False
+            if op == "$exists" and (value is not None) != bool(arg):
+                return False
+        return True
+    return value == condition
+
+def matches(doc, query):
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(matches(doc, sub) for sub in condition):
+                return False
+        elif not _match_value(_get(doc, key), condition):
+            return False
+    return True
+
+def _set(doc, path, value):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.setdefault(part, {})
+    doc[parts[-1]] = value
+
+def apply_update(doc, update, inserting=False):
+    for key, value in update.get("$set", {}).items():
+        _set(doc, key, value)
+    for key, value in update.get("$inc", {}).items():
+        _set(doc, key, (_get(doc, key) or 0) + value)
+    for key in update.get("$unset", {}):
+        doc.pop(key, None)
+    if inserting:
+        for key, value in update.get("$setOnInsert", {}).items():
+            _set(doc, key, value)
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+        self._limit = None
+
+    def sort(self, key, direction=1):
+        keys = key if isinstance(key, list) else [(key, direction)]
+        for field, order in reversed(keys):
+            self.docs.sort(key=lambda d: (_get(d, field) is None, _get(d, field)), reverse=order < 0)
+        return self
+
+    def limit(self, count):
+        self._limit = count
+        return self
+
+    def _result(self):
+        return self.docs[:self._limit] if self._limit else self.docs
+
+    async def to_list(self, length=None):
+        docs = self._result()
+        return [copy.deepcopy(d) for d in (docs[:length] if length else docs)]
+
+    def __aiter__(self):
+        self._iter = iter(self._result())
+        return self
+
+    async def __anext__(self):
+        try:
+            return copy.deepcopy(next(self._iter))
+        except StopIteration:
+            raise StopAsyncIteration
+
+    async def explain(self):
+        return {"queryPlanner": {"winningPlan": {"stage": "IXSCAN"}}}
+
+class FakeCollection:
+    def __init__(self, name):
+        self.name = name
+        self.docs = []
+
+    def _count(self, op):
+        ops[f"{self.name}.{op}"] += 1
+
+    async def create_index(self, keys, **options):
+        return "index"
+
+    async def insert_one(self, doc):
+        self._count("insert_one")
+        doc.setdefault("_id", ObjectId())
+        self.docs.append(copy.deepcopy(doc))
+        return SimpleNamespace(inserted_id=doc["_id"])
+
+    def _update(self, query, update, many=False, upsert=False):
+        modified = 0
+        for doc in self.docs:
+            if matches(doc, query):
+                apply_update(doc, update)
+                modified += 1
+                if not many:
+                    break
+        upserted_id = None
+        if not modified and upsert:
+            doc = {k: v for k, v in query.items() if not isinstance(v, dict)}
+            doc["_id"] = upserted_id = ObjectId()
+            apply_update(doc, update, inserting=True)
+            self.docs.append(doc)
+        return SimpleNamespace(matched_count=modified, modified_count=modified, upserted_id=upserted_id)
+
+    async def update_one(self, query, update, upsert=False):
+        self._count("update_one")
+        return self._update(query, update, upsert=upsert)
+
+    async def update_many(self, query, update, upsert=False):
+        self._count("update_many")
+        return self._update(query, update, many=True, upsert=upsert)
+
+    async def find_one(self, query=None, projection=None, sort=None):
+        self._count("find_one")
+        for doc in self.docs:
+            if matches(doc, query or {}):
+                return copy.deepcopy(doc)
+        return None
+
+    async def find_one_and_update(self, query, update, sort=None, return_document=False, upsert=False, **kwargs):
+        self._count("find_one_and_update")
+        candidates = [d for d in self.docs if matches(d, query)]
+        if sort:
+            for field, order in reversed(sort):
+                candidates.sort(key=lambda d: (_get(d, field) is None, _get(d, field)), reverse=order < 0)
+        if not candidates:
+            if upsert:
+                self._update(query, update, upsert=True)
+            return None
+        before = copy.deepcopy(candidates[0])
+        apply_update(candidates[0], update)
+        return copy.deepcopy(candidates[0]) if return_document else before
+
+    async def find_one_and_delete(self, query, **kwargs):
+        self._count("find_one_and_delete")
+        for i, doc in enumerate(self.docs):
+            if matches(doc, query):
+                return self.docs.pop(i)
+        return None
+
+    def find(self, query=None, projection=None):
+        self._count("find")
+        return FakeCursor([d for d in self.docs if matches(d, query or {})])
+
+    async def count_documents(self, query):
+        self._count("count_documents")
+        return sum(1 for d in self.docs if matches(d, query))
+
+    def aggregate(self, pipeline):
+        # Only $match/$group/$sort/$limit with $sum are needed by the bot
+        self._count("aggregate")
+        docs = list(self.docs)
+        for stage in pipeline:
+            if "$match" in stage:
+                docs = [d for d in docs if matches(d, stage["$match"])]
+            elif "$group" in stage:
+                spec = stage["$group"]
+                groups = {}
+                for d in docs:
+                    key_spec = spec["_id"]
+                    if isinstance(key_spec, dict):
+                        key = tuple((k, _get(d, v.lstrip("$"))) for k, v in key_spec.items())
+                    else:
+                        key = _get(d, key_spec.lstrip("$")) if key_spec else None
+                    row = groups.setdefault(key, {"_id": dict(key) if isinstance(key, tuple) else key})
+                    for field, acc in spec.items():
+                        if field != "_id":
+                            arg = acc["$sum"]
+                            row[field] = row.get(field, 0) + (arg if isinstance(arg, int) else _get(d, arg.lstrip("$")) or 0)
+                docs = list(groups.values())
+            elif "$sort" in stage:
+                for field, order in reversed(list(stage["$sort"].items())):
+                    docs.sort(key=lambda d: _get(d, field), reverse=order < 0)
+            elif "$limit" in stage:
+                docs = docs[:stage["$limit"]]
+        return FakeCursor(docs)
+
+    async def bulk_write(self, operations, ordered=True):
+        self._count("bulk_write")
+        if not operations:
+            # Like pymongo, so callers must not send empty batches
+            raise InvalidOperation("No operations to execute")
+        inserted = modified = upserted = 0
+        for op in operations:
+            # pymongo request objects keep their arguments in private slots
+            kind = type(op).__name__
+            if kind == "InsertOne":
+                doc = op._doc
+                doc.setdefault("_id", ObjectId())
+                self.docs.append(copy.deepcopy(doc))
+                inserted += 1
+            elif kind in ("UpdateOne", "UpdateMany"):
+                result = self._update(op._filter, op._doc, many=kind == "UpdateMany", upsert=bool(op._upsert))
+                modified += result.modified_count
+                upserted += result.upserted_id is not None
+        return SimpleNamespace(inserted_count=inserted, modified_count=modified, upserted_count=upserted)
+
+    async def delete_many(self, query):
+        self._count("delete_many")
+        before = len(self.docs)
+        self.docs = [d for d in self.docs if not matches(d, query)]
+        return SimpleNamespace(deleted_count=before - len(self.docs))
+
+class FakeDatabase:
+    def __init__(self):
+        self._collections = {}
+
+    def __getitem__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if name not in self._collections:
+            self._collections[name] = FakeCollection(name)
+        return self._collections[name]
+
+    __getattr__ = __getitem__
+
+def install(database):
+    """Point a MongoDB instance (database.operations.db) at fresh fakes"""
+    fake = FakeDatabase()
+    database.db = fake
+    database.chats = fake.chats
+    database.requests = fake.requests
+    ops.clear()
+    return fake
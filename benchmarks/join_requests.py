@@ -0,0 +1,266 @@
+"""End-to-end join-request throughput benchmark.
+
+Drives the real handlers (chat_join_request_handler, accept_all_requests)
+with synthetic updates and stubbed Telegram transports, against either the
+in-process fake Mongo (default) or a local MongoDB (--mongo-url).
+
+    python -m benchmarks.join_requests --chats 20 --users 5000 --out run.json
+    python -m benchmarks.join_requests --compare run.json --out new.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+from pymongo import monitoring
+
+from config import config
+from database.operations import db
+from database.write_buffer import write_buffer
+from benchmarks import fake_mongo
+
+# Metrics compared against a baseline, and whether higher is better
+COMPARED = {
+    "join.throughput": True,
+    "join.p50_ms": False,
+    "join.p99_ms": False,
+    "join.mongo_ops_per_request": False,
+    "accept_all.throughput": True,
+    "accept_all.mongo_ops_per_request": False,
+}
+
+class FakeJoinRequest:
+    """Duck-typed aiogram ChatJoinRequest; approve() sleeps like the API would"""
+
+    def __init__(self, chat_id, user_id, latency, limiter=None):
+        self.chat = SimpleNamespace(id=chat_id, title=f"Bench chat {chat_id}")
+        self.from_user = SimpleNamespace(id=user_id, username=f"user{user_id}", first_name="Bench")
+        self.latency = latency
+        self.limiter = limiter
+
+    async def approve(self):
+        if self.limiter:
+            await self.limiter.acquire("approveChatJoinRequest", self.chat.id)
+        await asyncio.sleep(self.latency)
+
+class FakeMessage:
+    def __init__(self):
+        self.edits = []
+
+    async def edit_text(self, text, **kwargs):
+        self.edits.append(text)
+
+class CommandCounter(monitoring.CommandListener):
+    """pymongo command listener counting server round-trips"""
+
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+class MongoOps:
+    """Counts Mongo operations on whichever backend is in use"""
+
+    def __init__(self, command_counter=None):
+        self.command_counter = command_counter
+
+    def total(self):
+        if self.command_counter:
+            return self.command_counter.count
+        return sum(fake_mongo.ops.values())
+
+async def use_backend(mongo_url):
+    if not mongo_url:
+        fake_mongo.install(db)
+        return MongoOps()
+
+    from motor.motor_asyncio import AsyncIOMotorClient
+    counter = CommandCounter()
+    db.client = AsyncIOMotorClient(mongo_url, event_listeners=[counter])
+    db.db = db.client[f"{config.DB_NAME}_bench"]
+    await db.db.chats.drop()
+    await db.db.requests.drop()
+    db.chats = db.db.chats
+    db.requests = db.db.requests
+    await db.init()
+    return MongoOps(counter)
+
+async def seed_chats(count):
+    chat_ids = [-1000000000000 - i for i in range(count)]
+    for chat_id in chat_ids:
+        await db.add_chat({
+            "chat_id": str(chat_id),
+            "title": f"Bench chat {chat_id}",
+            "chat_type": "channel",
+            "added_by": config.OWNER_ID,
+            "is_active": True
+        })
+    return chat_ids
+
+async def bench_join_requests(args, chat_ids, ops):
+    from handlers.group_events import chat_join_request_handler
+    from utils.rate_limiter import bot_limiter
+
+    limiter = bot_limiter if args.through_limiter else None
+    updates = [
+        FakeJoinRequest(random.choice(chat_ids), 10_000 + i, args.api_latency, limiter)
+        for i in range(args.users)
+    ]
+    latencies = []
+    gate = asyncio.Semaphore(args.concurrency)
+
+    async def handle(update):
+        async with gate:
+            started = time.perf_counter()
+            await chat_join_request_handler(update)
+            latencies.append(time.perf_counter() - started)
+
+    ops_before = ops.total()
+    started = time.perf_counter()
+    await asyncio.gather(*(handle(update) for update in updates))
+    await write_buffer.flush()
+    elapsed = time.perf_counter() - started
+    mongo_ops = ops.total() - ops_before
+
+    return {
+        "requests": len(updates),
+        "elapsed_s": round(elapsed, 3),
+        "throughput": round(len(updates) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "mongo_ops": mongo_ops,
+        "mongo_ops_per_request": round(mongo_ops / len(updates), 3),
+    }
+
+async def bench_accept_all(args, chat_id, ops):
+    from handlers import callback as callback_handlers
+    from userbot.client import userbot_client
+
+    # Pending backlog for one chat
+    for i in range(args.backlog):
+        await write_buffer.add_request({
+            "chat_id": str(chat_id),
+            "user_id": 500_000 + i,
+            "username": "",
+            "first_name": "Backlog",
+            "status": "pending"
+        })
+    await write_buffer.flush()
+
+    async def accept_join_request(chat, user_id):
+        await asyncio.sleep(args.api_latency)
+        return True
+
+    async def accept_all_join_requests(chat, link=None):
+        await asyncio.sleep(args.api_latency)
+        return args.bulk
+
+    async def invite_users(chat, user_ids, batch_size=None):
+        return []
+
+    userbot_client.accept_join_request = accept_join_request
+    userbot_client.accept_all_join_requests = accept_all_join_requests
+    userbot_client.invite_users = invite_users
+
+    message = FakeMessage()
+    callback = SimpleNamespace(message=message, from_user=SimpleNamespace(id=config.OWNER_ID))
+
+    ops_before = ops.total()
+    started = time.perf_counter()
+    await callback_handlers.accept_all_requests(callback, str(chat_id))
+    await write_buffer.flush()
+    elapsed = time.perf_counter() - started
+    mongo_ops = ops.total() - ops_before
+
+    return {
+        "requests": args.backlog,
+        "elapsed_s": round(elapsed, 3),
+        "throughput": round(args.backlog / elapsed, 1),
+        "progress_edits": len(message.edits),
+        "mongo_ops": mongo_ops,
+        "mongo_ops_per_request": round(mongo_ops / max(args.backlog, 1), 3),
+    }
+
+def compare(result, baseline, tolerance):
+    """Regressions beyond tolerance (fraction) as readable strings"""
+    regressions = []
+    for path, higher_is_better in COMPARED.items():
+        section, key = path.split(".")
+        new = result.get(section, {}).get(key)
+        old = baseline.get(section, {}).get(key)
+        if not new or not old:
+            continue
+        change = (new - old) / old
+        if (higher_is_better and change < -tolerance) or (not higher_is_better and change > tolerance):
+            regressions.append(f"{path}: {old} -> {new} ({change:+.1%})")
+    return regressions
+
+async def run(args):
+    ops = await use_backend(args.mongo_url)
+    write_buffer.start()
+    try:
+        chat_ids = await seed_chats(args.chats)
+        result = {
+            "timestamp": datetime.utcnow().isoformat(),
+            "backend": "mongodb" if args.mongo_url else "fake",
+            "params": {k: v for k, v in vars(args).items() if k not in ("out", "compare", "mongo_url")},
+            "join": await bench_join_requests(args, chat_ids, ops),
+        }
+        if args.backlog:
+            result["accept_all"] = await bench_accept_all(args, chat_ids[0], ops)
+    finally:
+        await write_buffer.stop()
+    return result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chats", type=int, default=10)
+    parser.add_argument("--users", type=int, default=2000, help="join requests to send")
+    parser.add_argument("--concurrency", type=int, default=100, help="updates handled at once")
+    parser.add_argument("--api-latency", type=float, default=0.02, help="simulated Telegram latency (s)")
+    parser.add_argument("--through-limiter", action="store_true", help="route approvals through the bot rate limiter")
+    parser.add_argument("--backlog", type=int, default=500, help="pending requests for Accept All (0 skips)")
+    parser.add_argument("--bulk", action="store_true", help="let Accept All take the HideAll bulk path")
+    parser.add_argument("--mongo-url", help="benchmark against a real MongoDB instead of the fake")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="write results JSON here")
+    parser.add_argument("--compare", help="baseline results JSON to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed regression fraction")
+    args = parser.parse_args(argv)
+
+    random.seed(args.seed)
+    result = asyncio.run(run(args))
+    print(json.dumps(result, indent=2))
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(result, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,17 +7,117 @@ class Config:
     # Bot
     BOT_TOKEN = os.getenv("BOT_TOKEN")
     OWNER_ID = int(os.getenv("OWNER_ID", 0))
+    # Point the bot at a local Bot API server, e.g. emulator/bot_api.py
+    BOT_API_SERVER = os.getenv("BOT_API_SERVER", "")
+    # Run against emulator/ in-process (polling only): one shared world for
+    # the Bot API and EMULATOR_USERBOTS fake Telethon clients
+    EMULATOR = os.getenv("EMULATOR", "false").lower() in ("1", "true")
+    EMULATOR_PORT = int(os.getenv("EMULATOR_PORT", 8081))
+    EMULATOR_USERBOTS = int(os.getenv("EMULATOR_USERBOTS", 1))
+    EMULATOR_LATENCY = float(os.getenv("EMULATOR_LATENCY", 0))
+    EMULATOR_RATE_429 = float(os.getenv("EMULATOR_RATE_429", 0))
+    EMULATOR_FLOOD_WAIT = float(os.getenv("EMULATOR_FLOOD_WAIT", 0))
+    EMULATOR_FLOOD_SECONDS = int(os.getenv("EMULATOR_FLOOD_SECONDS", 5))
+    
+    # Update intake: "polling" or "webhook"
+    BOT_MODE = os.getenv("BOT_MODE", "polling").lower()
+    WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")  # public base URL Telegram posts to
+    WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+    WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+    WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", 8080))
+    WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+    WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", 1))
+    WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", 10000))
+    
+    # Update executor: ordered per chat, parallel across chats
+    UPDATE_CONCURRENCY = int(os.getenv("UPDATE_CONCURRENCY", 256))
+    UPDATE_CHAT_CONCURRENCY = int(os.getenv("UPDATE_CHAT_CONCURRENCY", 32))
+    UPDATE_QUEUE_SIZE = int(os.getenv("UPDATE_QUEUE_SIZE", 10000))
+    UPDATE_IDLE_TTL = int(os.getenv("UPDATE_IDLE_TTL", 60))
     
     # Telethon Userbot
     API_ID = int(os.getenv("API_ID", 0))
     API_HASH = os.getenv("API_HASH")
     SESSION_STRING = os.getenv("USERBOT_SESSION", "")
+    # Several accounts for the userbot pool, comma separated
+    SESSION_STRINGS = [s.strip() for s in os.getenv("USERBOT_SESSIONS", "").split(",") if s.strip()] or (
+        [SESSION_STRING] if SESSION_STRING else []
+    )
+    USERBOT_RING_REPLICAS = int(os.getenv("USERBOT_RING_REPLICAS", 64))
+    # How long a chat sticks to the session that joined it, awaiting promotion
+    USERBOT_JOINING_TTL = float(os.getenv("USERBOT_JOINING_TTL", 3600))
+    ENTITY_CACHE_SIZE = int(os.getenv("ENTITY_CACHE_SIZE", 10000))
+    ENTITY_CACHE_TTL = int(os.getenv("ENTITY_CACHE_TTL", 3600))
     
     # Database
     MONGODB_URL = os.getenv("MONGODB_URL")
     DB_NAME = "auto_req_bot"
+    COUNTER_RECONCILE_INTERVAL = int(os.getenv("COUNTER_RECONCILE_INTERVAL", 600))
+    WRITE_BATCH_SIZE = int(os.getenv("WRITE_BATCH_SIZE", 500))
+    WRITE_FLUSH_INTERVAL = float(os.getenv("WRITE_FLUSH_INTERVAL", 1.0))
+    WRITE_QUEUE_SIZE = int(os.getenv("WRITE_QUEUE_SIZE", 10000))
+    # Fail startup instead of warning when a hot query is not index-backed
+    INDEX_STRICT = os.getenv("INDEX_STRICT", "false").lower() == "true"
+    DASHBOARD_CACHE_TTL = int(os.getenv("DASHBOARD_CACHE_TTL", 30))
+    USER_SUMMARY_CACHE_SIZE = int(os.getenv("USER_SUMMARY_CACHE_SIZE", 10000))
+    USER_SUMMARY_CACHE_TTL = int(os.getenv("USER_SUMMARY_CACHE_TTL", 600))
+    
+    # Bulk approval ("Accept All")
+    APPROVAL_CONCURRENCY = int(os.getenv("APPROVAL_CONCURRENCY", 8))
+    APPROVAL_START_RATE = float(os.getenv("APPROVAL_START_RATE", 5))
+    APPROVAL_MAX_RATE = float(os.getenv("APPROVAL_MAX_RATE", 25))
+    APPROVAL_PROGRESS_INTERVAL = float(os.getenv("APPROVAL_PROGRESS_INTERVAL", 5))
+    APPROVAL_MAX_FLOOD_RETRIES = int(os.getenv("APPROVAL_MAX_FLOOD_RETRIES", 3))
+    INVITE_BATCH_SIZE = int(os.getenv("INVITE_BATCH_SIZE", 50))
+    # FloodWaits a bulk userbot call sits out before giving up
+    USERBOT_MAX_FLOOD_WAITS = int(os.getenv("USERBOT_MAX_FLOOD_WAITS", 2))
+    
+    # Durable approval queue: lease per attempt, retries with backoff, then dead
+    APPROVAL_LEASE = int(os.getenv("APPROVAL_LEASE", 30))
+    APPROVAL_MAX_ATTEMPTS = int(os.getenv("APPROVAL_MAX_ATTEMPTS", 5))
+    APPROVAL_RETRY_BASE = float(os.getenv("APPROVAL_RETRY_BASE", 5))
+    APPROVAL_RETRY_MAX = float(os.getenv("APPROVAL_RETRY_MAX", 600))
+    APPROVAL_QUEUE_INTERVAL = float(os.getenv("APPROVAL_QUEUE_INTERVAL", 5))
+    
+    # Startup backlog reconciliation against Telegram's pending lists
+    BACKLOG_CONCURRENCY = int(os.getenv("BACKLOG_CONCURRENCY", 4))
+    BACKLOG_PAGE_SIZE = int(os.getenv("BACKLOG_PAGE_SIZE", 100))
+    
+    # Background onboarding of newly added chats
+    ONBOARDING_WORKERS = int(os.getenv("ONBOARDING_WORKERS", 4))
+    ONBOARDING_MAX_ATTEMPTS = int(os.getenv("ONBOARDING_MAX_ATTEMPTS", 5))
+    ONBOARDING_RETRY_BASE = float(os.getenv("ONBOARDING_RETRY_BASE", 10))
+    ONBOARDING_RETRY_MAX = float(os.getenv("ONBOARDING_RETRY_MAX", 900))
+    # How long to poll for channel access after the userbot joins
+    USERBOT_READY_TIMEOUT = float(os.getenv("USERBOT_READY_TIMEOUT", 30))
+    
+    # Fleet health audit (/audit)
+    AUDIT_CONCURRENCY = int(os.getenv("AUDIT_CONCURRENCY", 8))
+    AUDIT_WRITE_BATCH = int(os.getenv("AUDIT_WRITE_BATCH", 200))
+    
+    # Bot / userbot membership cache in PromotionService
+    PERMISSION_CACHE_SIZE = int(os.getenv("PERMISSION_CACHE_SIZE", 50000))
+    PERMISSION_CACHE_TTL = int(os.getenv("PERMISSION_CACHE_TTL", 600))
+    PERMISSION_WARMUP_CONCURRENCY = int(os.getenv("PERMISSION_WARMUP_CONCURRENCY", 5))
+    # Warm only the busiest chats: at ~10 loads/s a full fleet would expire
+    # (TTL) or evict (SIZE) its first entries before the warm-up ends
+    PERMISSION_WARMUP_LIMIT = int(os.getenv("PERMISSION_WARMUP_LIMIT", 2000))
+    
+    # Outbound rate limits (calls/s)
+    BOT_GLOBAL_RATE = float(os.getenv("BOT_GLOBAL_RATE", 28))
+    BOT_CHAT_RATE = float(os.getenv("BOT_CHAT_RATE", 1))
+    USERBOT_GLOBAL_RATE = float(os.getenv("USERBOT_GLOBAL_RATE", 20))
+    
+    # Prometheus metrics endpoint (0 = disabled)
+    METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+    METRICS_PORT = int(os.getenv("METRICS_PORT", 0))
     
     # Logging
     LOG_CHANNEL = int(os.getenv("LOG_CHANNEL", 0))
+    LOG_DIGEST_INTERVAL = int(os.getenv("LOG_DIGEST_INTERVAL", 60))
+    LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 1000))
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+    # Hot-path detail records kept per second before sampling kicks in
+    LOG_SAMPLE_LIMIT = int(os.getenv("LOG_SAMPLE_LIMIT", 50))
 
 config = Config()
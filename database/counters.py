@@ -0,0 +1,172 @@
+import asyncio
+from collections import defaultdict
+from contextlib import contextmanager
+from pymongo import UpdateOne
+from config import config
+from database.operations import db
+from utils.log import get_logger
+
+log = get_logger("counters")
+
+COUNTER_FIELDS = ("total_requests", "pending_requests", "accepted_requests")
+
+# Statuses counted as pending: waiting, or leased by an approval worker
+PENDING_STATUSES = ("pending", "processing")
+
+class RequestCounters:
+    """Per-chat request counters kept on the chat document.
+
+    Every state transition is a single atomic $inc, so concurrent join
+    requests never lose updates and nothing has to rescan `requests`.
+    The reconciler rebuilds the counters from `requests` in the
+    background to repair drift (crashes between the request write and
+    the counter write, manual edits, ...).
+
+    Writers hold a chat between writing its requests and applying the
+    matching $inc; the reconciler leaves held chats alone, since their
+    rows are already counted in `requests` but not yet on the chat.
+    """
+
+    def __init__(self, database):
+        self.db = database
+        self._task = None
+        # Write buffer to flush before reconciling (see start_reconciler)
+        self.buffer = None
+        # chat_id -> writes whose $inc has not been applied yet
+        self._held = defaultdict(int)
+
+    def hold(self, chat_id):
+        self._held[str(chat_id)] += 1
+
+    def release(self, chat_id):
+        chat_id = str(chat_id)
+        self._held[chat_id] -= 1
+        if self._held[chat_id] <= 0:
+            del self._held[chat_id]
+
+    @contextmanager
+    def changing(self, chat_id):
+        """Hold the chat around a request write and its $inc"""
+        self.hold(chat_id)
+        try:
+            yield
+        finally:
+            self.release(chat_id)
+
+    def held_chats(self):
+        return set(self._held)
+
+    async def _inc(self, chat_id, **deltas):
+        return await self.db.chats.update_one(
+            {"chat_id": str(chat_id)},
+            {"$inc": deltas}
+        )
+
+    async def request_added(self, chat_id, count=1):
+        """New pending request(s)"""
+        return await self._inc(chat_id, total_requests=count, pending_requests=count)
+
+    async def request_accepted(self, chat_id, count=1):
+        """Pending request(s) moved to accepted"""
+        return await self._inc(chat_id, pending_requests=-count, accepted_requests=count)
+
+    async def request_dropped(self, chat_id, count=1):
+        """Pending request(s) left the pending state without being accepted"""
+        return await self._inc(chat_id, pending_requests=-count)
+
+    async def apply_deltas(self, deltas):
+        """Apply many $inc at once: {chat_id: {field: delta}}"""
+        operations = [
+            UpdateOne({"chat_id": str(cid)}, {"$inc": fields})
+            for cid, fields in deltas.items() if any(fields.values())
+        ]
+        if operations:
+            return await self.db.chats.bulk_write(operations, ordered=False)
+
+    async def count_from_requests(self, chat_id=None):
+        """Recount counters from the requests collection: {chat_id: stats}"""
+        pipeline = []
+        if chat_id is not None:
+            pipeline.append({"$match": {"chat_id": str(chat_id)}})
+        pipeline.append({"$group": {
+            "_id": {"chat_id": "$chat_id", "status": "$status"},
+            "count": {"$sum": 1}
+        }})
+
+        counts = {}
+        async for row in self.db.requests.aggregate(pipeline):
+            stats = counts.setdefault(row["_id"]["chat_id"], dict.fromkeys(COUNTER_FIELDS, 0))
+            stats["total_requests"] += row["count"]
+            if row["_id"]["status"] in PENDING_STATUSES:
+                stats["pending_requests"] += row["count"]
+            elif row["_id"]["status"] == "accepted":
+                stats["accepted_requests"] += row["count"]
+        return counts
+
+    async def reconcile(self, chat_id=None):
+        """Rewrite drifted counters, returns the number of chats fixed.
+
+        Counters are snapshotted before recounting and only overwritten if
+        they are still unchanged, so a pass never clobbers an $inc that
+        landed while it was running - such chats are retried next pass.
+        Chats held by a writer at either end of the recount are skipped
+        too: their new rows may be counted before their $inc lands.
+        """
+        if self.buffer is not None:
+            # Land buffered $inc first, so fewer chats are held
+            await self.buffer.flush()
+        held = self.held_chats()
+        query = {"chat_id": str(chat_id)} if chat_id is not None else {}
+        projection = {"_id": 0, "chat_id": 1, **{f: 1 for f in COUNTER_FIELDS}}
+        snapshot = {
+            # Missing fields stay None, which also matches them in the filter
+            chat["chat_id"]: {f: chat.get(f) for f in COUNTER_FIELDS}
+            async for chat in self.db.chats.find(query, projection)
+        }
+        counts = await self.count_from_requests(chat_id)
+        held |= self.held_chats()
+
+        operations = []
+        for cid, current in snapshot.items():
+            if cid in held:
+                continue
+            expected = counts.get(cid, dict.fromkeys(COUNTER_FIELDS, 0))
+            if current == expected:
+                continue
+            operations.append(UpdateOne(
+                {"chat_id": cid, **current},
+                {"$set": expected}
+            ))
+
+        if not operations:
+            return 0
+        result = await self.db.chats.bulk_write(operations, ordered=False)
+        return result.modified_count
+
+    async def _reconcile_loop(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                fixed = await self.reconcile()
+                if fixed:
+                    log.info(f"Counter reconciler fixed {fixed} chats")
+            except Exception as e:
+                log.warning(f"Counter reconcile failed: {e}")
+
+    def start_reconciler(self, interval=None, buffer=None):
+        self.buffer = buffer
+        if self._task is None:
+            interval = interval or config.COUNTER_RECONCILE_INTERVAL
+            self._task = asyncio.create_task(self._reconcile_loop(interval))
+
+    async def stop_reconciler(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+# Global instance
+counters = RequestCounters(db)
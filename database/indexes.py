@@ -0,0 +1,97 @@
+from datetime import datetime
+from pymongo import ASCENDING, DESCENDING
+from config import config
+from utils.log import get_logger
+
+log = get_logger("indexes")
+
+# Every index the bot needs, per collection: (keys, options)
+INDEXES = {
+    "chats": [
+        ([("chat_id", ASCENDING)], {"unique": True}),
+        # /manage and my_* lists, paged by _id
+        ([("added_by", ASCENDING), ("chat_type", ASCENDING), ("_id", ASCENDING)], {}),
+        # db_* lists paged by _id, dashboard counts
+        ([("chat_type", ASCENDING), ("_id", ASCENDING)], {}),
+        # Dashboard "recent chats"
+        ([("added_date", DESCENDING)], {}),
+        # Unhealthy chats from the last audit
+        ([("health.healthy", ASCENDING)], {}),
+    ],
+    "requests": [
+        ([("chat_id", ASCENDING), ("user_id", ASCENDING)], {}),
+        # Stats recount and reconciler grouping
+        ([("chat_id", ASCENDING), ("status", ASCENDING)], {}),
+        # "Accept All" only ever reads the pending slice
+        ([("chat_id", ASCENDING), ("request_date", ASCENDING)], {
+            "name": "pending_by_chat",
+            "partialFilterExpression": {"status": "pending"}
+        }),
+        # Approval queue: retries that are due, leases that ran out
+        ([("status", ASCENDING), ("next_attempt_at", ASCENDING)], {
+            "name": "retry_due",
+            "partialFilterExpression": {"next_attempt_at": {"$exists": True}}
+        }),
+        ([("lease_until", ASCENDING)], {
+            "name": "expired_leases",
+            "partialFilterExpression": {"status": "processing"}
+        }),
+    ],
+}
+
+# Query shapes the code runs on hot paths: (collection, filter, sort)
+QUERY_SHAPES = [
+    ("chats", {"chat_id": "0"}, None),
+    ("chats", {"added_by": 0}, None),
+    ("chats", {"added_by": 0, "chat_type": "group"}, [("_id", ASCENDING)]),
+    ("chats", {"chat_type": "group"}, [("_id", ASCENDING)]),
+    ("chats", {}, [("added_date", DESCENDING)]),
+    ("chats", {"health.healthy": False}, None),
+    ("requests", {"chat_id": "0", "user_id": 0}, None),
+    ("requests", {"chat_id": "0", "status": "pending"}, [("request_date", ASCENDING)]),
+    ("requests", {"chat_id": "0", "status": "accepted"}, None),
+    ("requests", {"status": "pending", "next_attempt_at": {"$lte": datetime(2000, 1, 1)}}, None),
+    ("requests", {"status": "processing", "lease_until": {"$lt": datetime(2000, 1, 1)}}, None),
+]
+
+async def ensure_indexes(database):
+    """Create every registered index (no-op for ones that already exist)"""
+    for collection, specs in INDEXES.items():
+        for keys, options in specs:
+            await database.db[collection].create_index(keys, **options)
+
+def _stages(plan):
+    """Yield every stage name in an explain() plan tree"""
+    yield plan.get("stage")
+    for child_key in ("inputStage", "outerStage", "innerStage"):
+        if child_key in plan:
+            yield from _stages(plan[child_key])
+    for child in plan.get("inputStages", []):
+        yield from _stages(child)
+
+async def verify_query_shapes(database, strict=None):
+    """Explain every registered query shape and report collection scans.
+
+    Logs a warning per unindexed shape, or raises RuntimeError when strict
+    (config.INDEX_STRICT) so a missing index fails startup.
+    """
+    strict = config.INDEX_STRICT if strict is None else strict
+    unindexed = []
+
+    for collection, query, sort in QUERY_SHAPES:
+        cursor = database.db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        plan = await cursor.explain()
+        winning = plan.get("queryPlanner", {}).get("winningPlan", {})
+        # Newer servers nest the classic plan under queryPlan
+        winning = winning.get("queryPlan", winning)
+        if "COLLSCAN" in set(_stages(winning)):
+            unindexed.append((collection, query))
+
+    for collection, query in unindexed:
+        log.warning(f"Query on {collection} is not index-backed: {query}")
+
+    if unindexed and strict:
+        raise RuntimeError(f"{len(unindexed)} registered query shapes are not index-backed")
+    return unindexed
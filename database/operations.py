@@ -1,78 +1,385 @@
-from pymongo import MongoClient
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument, UpdateOne
 from pymongo.errors import DuplicateKeyError
-from datetime import datetime
+from bson import ObjectId
+from datetime import datetime, timedelta
 from config import config
+from database.indexes import ensure_indexes, verify_query_shapes
+from utils.metrics import mongo_op
 
 class MongoDB:
     def __init__(self):
-        self.client = MongoClient(config.MONGODB_URL)
+        # Motor connects lazily, so building the client here does no I/O
+        self.client = AsyncIOMotorClient(config.MONGODB_URL)
         self.db = self.client[config.DB_NAME]
         self.chats = self.db.chats
         self.requests = self.db.requests
-        
-        # Create indexes
-        self.chats.create_index("chat_id", unique=True)
-        self.requests.create_index([("chat_id", 1), ("user_id", 1)])
 
-    def add_chat(self, chat_data):
+    async def init(self):
+        """Create and verify indexes - called once from on_startup"""
+        await ensure_indexes(self)
+        await verify_query_shapes(self)
+
+    def close(self):
+        self.client.close()
+
+    @mongo_op
+    async def add_chat(self, chat_data):
         try:
             chat_data['added_date'] = datetime.utcnow()
-            result = self.chats.insert_one(chat_data)
+            for field in ("total_requests", "pending_requests", "accepted_requests"):
+                chat_data.setdefault(field, 0)
+            result = await self.chats.insert_one(chat_data)
             return result.inserted_id
         except DuplicateKeyError:
             return None
 
-    def get_chat(self, chat_id):
-        return self.chats.find_one({"chat_id": str(chat_id)})
+    @mongo_op
+    async def get_chat(self, chat_id):
+        return await self.chats.find_one({"chat_id": str(chat_id)})
+
+    @mongo_op
+    async def remove_chat(self, chat_id):
+        """Delete a chat, returns the removed document (or None)"""
+        return await self.chats.find_one_and_delete({"chat_id": str(chat_id)})
+
+    @mongo_op
+    async def get_all_chats(self):
+        return await self.chats.find().to_list(length=None)
+
+    @mongo_op
+    async def get_chats_by_type(self, chat_type):
+        return await self.chats.find({"chat_type": chat_type}).to_list(length=None)
+
+    @mongo_op
+    async def get_active_chat_ids(self, chat_type=None):
+        query = {"is_active": True}
+        if chat_type:
+            query["chat_type"] = chat_type
+        cursor = self.chats.find(query, {"_id": 0, "chat_id": 1})
+        return [chat["chat_id"] async for chat in cursor]
+
+    @mongo_op
+    async def get_busiest_chat_ids(self, limit):
+        """Active chats with the most pending, then total, requests"""
+        cursor = self.chats.find({"is_active": True}, {"_id": 0, "chat_id": 1}).sort(
+            [("pending_requests", -1), ("total_requests", -1)]
+        ).limit(limit)
+        return [chat["chat_id"] async for chat in cursor]
+
+    @mongo_op
+    async def get_user_chats(self, user_id, chat_type=None):
+        query = {"added_by": user_id}
+        if chat_type:
+            query["chat_type"] = chat_type
+        return await self.chats.find(query).to_list(length=None)
 
-    def get_all_chats(self):
-        return list(self.chats.find())
+    @mongo_op
+    async def get_chats_page(self, query, after=None, before=None, limit=8):
+        """One page of chats by keyset on _id, returns (chats, has_prev, has_next).
 
-    def get_chats_by_type(self, chat_type):
-        return list(self.chats.find({"chat_type": chat_type}))
+        `after`/`before` are the _id (hex) of the last/first chat of the page
+        the user came from, so a page costs the same wherever it is.
+        """
+        projection = {"chat_id": 1, "title": 1, "is_active": 1}
+        query = dict(query)
+        if before:
+            query["_id"] = {"$lt": ObjectId(before)}
+            cursor = self.chats.find(query, projection).sort("_id", -1)
+        else:
+            if after:
+                query["_id"] = {"$gt": ObjectId(after)}
+            cursor = self.chats.find(query, projection).sort("_id", 1)
 
-    def update_chat_stats(self, chat_id, stats_update):
-        return self.chats.update_one(
+        chats = await cursor.limit(limit + 1).to_list(length=limit + 1)
+        has_more = len(chats) > limit
+        chats = chats[:limit]
+
+        if before:
+            chats.reverse()
+            return chats, has_more, True
+        return chats, after is not None, has_more
+
+    @mongo_op
+    async def get_user_chat_counts(self, limit=10):
+        """Number of chats per user who added the bot, biggest first"""
+        pipeline = [
+            {"$group": {"_id": "$added_by", "count": {"$sum": 1}}},
+            {"$sort": {"count": -1}},
+            {"$limit": limit}
+        ]
+        return await self.chats.aggregate(pipeline).to_list(length=None)
+
+    @mongo_op
+    async def set_userbot_setup(self, chat_id, done=True):
+        return await self.chats.update_one(
+            {"chat_id": str(chat_id)},
+            {"$set": {"userbot_setup": done}}
+        )
+
+    @mongo_op
+    async def set_onboarding(self, chat_id, **fields):
+        """Update the onboarding job state kept on the chat document"""
+        return await self.chats.update_one(
+            {"chat_id": str(chat_id)},
+            {"$set": {f"onboarding.{key}": value for key, value in fields.items()}}
+        )
+
+    @mongo_op
+    async def set_invite_link(self, chat_id, invite_link):
+        """Store the userbot's join link for a chat, None once it is spent"""
+        return await self.chats.update_one(
+            {"chat_id": str(chat_id)},
+            {"$set": {"invite_link": invite_link}}
+        )
+
+    @mongo_op
+    async def get_parked_onboarding(self, stages):
+        """Chats waiting for a userbot: parked, or failed at one of `stages`"""
+        return await self.chats.find(
+            {"$or": [
+                {"onboarding.parked": True},
+                {"onboarding.stage": "failed", "onboarding.failed_stage": {"$in": list(stages)}},
+            ]},
+            {"_id": 0, "chat_id": 1, "onboarding": 1}
+        ).to_list(length=None)
+
+    @mongo_op
+    async def get_unfinished_onboarding(self):
+        """Chats whose onboarding was interrupted, with their job state"""
+        return await self.chats.find(
+            {"onboarding.stage": {"$exists": True, "$nin": ["done", "failed"]}},
+            {"_id": 0, "chat_id": 1, "onboarding": 1}
+        ).to_list(length=None)
+
+    @mongo_op
+    async def set_chat_health(self, records):
+        """Store audit results in bulk: {chat_id: health record}"""
+        operations = [
+            UpdateOne({"chat_id": str(chat_id)}, {"$set": {"health": health}})
+            for chat_id, health in records.items()
+        ]
+        if operations:
+            await self.chats.bulk_write(operations, ordered=False)
+
+    @mongo_op
+    async def get_unhealthy_chats(self, limit=20):
+        return await self.chats.find(
+            {"health.healthy": False},
+            {"_id": 0, "chat_id": 1, "title": 1, "chat_type": 1, "health": 1}
+        ).limit(limit).to_list(length=limit)
+
+    @mongo_op
+    async def add_chat_userbot(self, chat_id, userbot_id):
+        """Record a userbot account as admin of the chat"""
+        return await self.chats.update_one(
+            {"chat_id": str(chat_id)},
+            {"$addToSet": {"userbots": userbot_id}, "$set": {"userbot_setup": True}}
+        )
+
+    @mongo_op
+    async def get_userbot_assignments(self):
+        """chat_id, userbots and userbot_setup of every active channel"""
+        return await self.chats.find(
+            {"is_active": True, "chat_type": "channel"},
+            {"_id": 0, "chat_id": 1, "userbots": 1, "userbot_setup": 1}
+        ).to_list(length=None)
+
+    @mongo_op
+    async def update_chat_stats(self, chat_id, stats_update):
+        return await self.chats.update_one(
             {"chat_id": str(chat_id)},
             {"$set": stats_update}
         )
 
-    def add_request(self, request_data):
+    @mongo_op
+    async def add_request(self, request_data):
         request_data['request_date'] = datetime.utcnow()
-        result = self.requests.insert_one(request_data)
+        result = await self.requests.insert_one(request_data)
         return result.inserted_id
 
-    def get_pending_requests(self, chat_id):
-        return list(self.requests.find({
+    @mongo_op
+    async def get_pending_requests(self, chat_id):
+        return await self.requests.find({
             "chat_id": str(chat_id),
             "status": "pending"
-        }))
+        }).sort("request_date", 1).to_list(length=None)
+
+    @mongo_op
+    async def update_request_status(self, chat_id, user_id, status, from_status=None):
+        """Set request status; with from_status only that transition matches,
+        so result.modified_count tells whether this call made the transition"""
+        update_data = {"status": status}
+        if status == "accepted":
+            update_data["accepted_date"] = datetime.utcnow()
+
+        query = {"chat_id": str(chat_id), "user_id": user_id}
+        if from_status:
+            query["status"] = from_status
 
-    def update_request_status(self, chat_id, user_id, status):
+        return await self.requests.update_one(query, {"$set": update_data})
+
+    @mongo_op
+    async def bulk_update_request_status(self, chat_id, status, user_ids=None, from_status="pending"):
+        """Move many requests of a chat in one update_many, returns how many changed"""
         update_data = {"status": status}
         if status == "accepted":
             update_data["accepted_date"] = datetime.utcnow()
-        
-        return self.requests.update_one(
-            {"chat_id": str(chat_id), "user_id": user_id},
-            {"$set": update_data}
+
+        query = {"chat_id": str(chat_id), "status": from_status}
+        if user_ids is not None:
+            query["user_id"] = {"$in": list(user_ids)}
+
+        result = await self.requests.update_many(query, {"$set": update_data})
+        return result.modified_count
+
+    @mongo_op
+    async def add_missing_requests(self, chat_id, requests):
+        """Queue requests that have no open (pending/processing) row yet.
+
+        Users never seen get a new row; a returning user's latest closed
+        row (accepted, dead, ...) is reopened as pending. Returns
+        (added, reopened) where `reopened` counts rows by previous status.
+        """
+        chat_id = str(chat_id)
+        now = datetime.utcnow()
+        open_statuses = ["pending", "processing"]
+        by_user = {request["user_id"]: request for request in requests}
+        if not by_user:
+            return 0, {}
+
+        open_users, closed = set(), {}
+        cursor = self.requests.find(
+            {"chat_id": chat_id, "user_id": {"$in": list(by_user)}},
+            {"_id": 1, "user_id": 1, "status": 1}
+        ).sort("request_date", 1)
+        async for row in cursor:
+            if row["status"] in open_statuses:
+                open_users.add(row["user_id"])
+            else:
+                closed[row["user_id"]] = row
+
+        def queued(request):
+            return {
+                "username": request.get("username", ""),
+                "first_name": request.get("first_name", ""),
+                "request_date": request.get("date") or now,
+                "status": "pending",
+                "attempts": 0,
+                "next_attempt_at": now,
+                "source": "backlog"
+            }
+
+        # Upsert against open rows only, so one the live handler inserted
+        # meanwhile is left alone instead of duplicated
+        operations = [
+            UpdateOne(
+                {"chat_id": chat_id, "user_id": user_id, "status": {"$in": open_statuses}},
+                {"$setOnInsert": queued(request)},
+                upsert=True
+            )
+            for user_id, request in by_user.items()
+            if user_id not in open_users and user_id not in closed
+        ]
+        added = 0
+        if operations:
+            result = await self.requests.bulk_write(operations, ordered=False)
+            added = result.upserted_count
+
+        reopen = {}
+        for user_id, row in closed.items():
+            if user_id not in open_users:
+                reopen.setdefault(row["status"], []).append((row["_id"], by_user[user_id]))
+        reopened = {}
+        for status, rows in reopen.items():
+            # One bulk per previous status, so the counters know what moved
+            result = await self.requests.bulk_write([
+                UpdateOne(
+                    {"_id": row_id, "status": status},
+                    {
+                        "$set": queued(request),
+                        "$unset": {"accepted_date": "", "dead_date": "", "lease_until": "", "last_error": ""}
+                    }
+                )
+                for row_id, request in rows
+            ], ordered=False)
+            if result.modified_count:
+                reopened[status] = result.modified_count
+        return added, reopened
+
+    @mongo_op
+    async def update_backlog_sync(self, chat_id, **fields):
+        """Backlog reconciliation checkpoint kept on the chat document"""
+        return await self.chats.update_one(
+            {"chat_id": str(chat_id)},
+            {"$set": {f"backlog_sync.{key}": value for key, value in fields.items()}}
         )
 
-    def get_chat_stats(self, chat_id):
-        total = self.requests.count_documents({"chat_id": str(chat_id)})
-        pending = self.requests.count_documents({
-            "chat_id": str(chat_id),
-            "status": "pending"
-        })
-        accepted = self.requests.count_documents({
-            "chat_id": str(chat_id),
-            "status": "accepted"
-        })
-        
+    @mongo_op
+    async def claim_request(self, lease_seconds):
+        """Lease one due request for an approval worker: a retry whose
+        backoff is over, or one whose previous worker's lease expired"""
+        now = datetime.utcnow()
+        return await self.requests.find_one_and_update(
+            {"$or": [
+                {"status": "pending", "next_attempt_at": {"$lte": now}},
+                {"status": "processing", "lease_until": {"$lt": now}}
+            ]},
+            {
+                "$set": {"status": "processing", "lease_until": now + timedelta(seconds=lease_seconds)},
+                "$inc": {"attempts": 1}
+            },
+            return_document=ReturnDocument.AFTER
+        )
+
+    @mongo_op
+    async def renew_lease(self, chat_id, user_id, lease_seconds):
+        """Extend the lease of a request still being approved"""
+        return await self.requests.update_one(
+            {"chat_id": str(chat_id), "user_id": user_id, "status": "processing"},
+            {"$set": {"lease_until": datetime.utcnow() + timedelta(seconds=lease_seconds)}}
+        )
+
+    @mongo_op
+    async def retry_request(self, chat_id, user_id, delay, error):
+        """Hand a leased request back with a backoff; delay=None parks it as
+        plain pending, which the approval queue never claims"""
+        update = {
+            "$set": {"status": "pending", "last_error": error},
+            "$unset": {"lease_until": ""}
+        }
+        if delay is None:
+            update["$unset"]["next_attempt_at"] = ""
+        else:
+            update["$set"]["next_attempt_at"] = datetime.utcnow() + timedelta(seconds=delay)
+        return await self.requests.update_one(
+            {"chat_id": str(chat_id), "user_id": user_id, "status": "processing"},
+            update
+        )
+
+    @mongo_op
+    async def dead_letter_request(self, chat_id, user_id, error):
+        """Give up on a leased request; it is kept with status dead"""
+        return await self.requests.update_one(
+            {"chat_id": str(chat_id), "user_id": user_id, "status": "processing"},
+            {
+                "$set": {"status": "dead", "last_error": error, "dead_date": datetime.utcnow()},
+                "$unset": {"lease_until": "", "next_attempt_at": ""}
+            }
+        )
+
+    @mongo_op
+    async def get_chat_stats(self, chat_id):
+        """Request counters maintained on the chat document (see database.counters)"""
+        chat = await self.chats.find_one(
+            {"chat_id": str(chat_id)},
+            {"_id": 0, "total_requests": 1, "pending_requests": 1, "accepted_requests": 1}
+        ) or {}
+
         return {
-            "total_requests": total,
-            "pending_requests": pending,
-            "accepted_requests": accepted
+            "total_requests": chat.get("total_requests", 0),
+            "pending_requests": chat.get("pending_requests", 0),
+            "accepted_requests": chat.get("accepted_requests", 0)
         }
 
 # Global instance
@@ -0,0 +1,244 @@
+import asyncio
+import time
+from collections import defaultdict
+from datetime import datetime
+from pymongo import InsertOne
+from pymongo.errors import BulkWriteError
+from config import config
+from database.operations import db
+from database.counters import counters, PENDING_STATUSES
+from utils.metrics import mongo_op_seconds, queue_depth
+from utils.log import get_logger, span, trace_id_var
+
+log = get_logger("write_buffer")
+
+# Queued by stop(): the flusher writes what it has collected and exits
+STOP = ("stop", None, None)
+# flush() queues ("flush", future, None), resolved once everything queued
+# before it is written
+FLUSH = "flush"
+
+class WriteBuffer:
+    """Write-behind buffer for join-request records.
+
+    Inserts and status transitions are queued and flushed as one unordered
+    bulk_write on `requests` plus one bulk $inc on `chats` per batch, once
+    the batch is full or the flush interval has passed. The queue is
+    bounded: producers wait when it is full (backpressure). A status
+    change for a request still waiting in the same batch is folded into
+    its insert, so ordering inside an unordered bulk never matters; other
+    status changes are applied per transition with update_many, and the
+    counters move only by what those updates actually matched. Every
+    queued item holds its chat in the counter store until its $inc is
+    applied, so the reconciler does not count it twice.
+    """
+
+    def __init__(self, database, counter_store, batch_size=None, flush_interval=None, max_queue=None):
+        self.db = database
+        self.counters = counter_store
+        self.batch_size = batch_size or config.WRITE_BATCH_SIZE
+        self.flush_interval = flush_interval or config.WRITE_FLUSH_INTERVAL
+        self.queue = asyncio.Queue(maxsize=max_queue or config.WRITE_QUEUE_SIZE)
+        self._task = None
+        queue_depth.set_function(self.queue.qsize, queue="write_buffer")
+
+    async def add_request(self, request_data):
+        request_data['request_date'] = datetime.utcnow()
+        await self._put(("insert", request_data, trace_id_var.get()))
+
+    async def insert_now(self, request_data):
+        """Write one request right away, its counter $inc goes through the buffer"""
+        chat_id = str(request_data["chat_id"])
+        with self.counters.changing(chat_id):
+            await self.db.add_request(request_data)
+            await self.request_added(chat_id)
+
+    async def request_added(self, chat_id):
+        """Count a request that was written directly (see insert_now)"""
+        await self._put(("added", str(chat_id), trace_id_var.get()))
+
+    async def update_status(self, chat_id, user_id, status, from_status="pending"):
+        await self._put(("status", (str(chat_id), user_id, status, from_status), trace_id_var.get()))
+
+    async def _put(self, item):
+        await self.queue.put(item)
+        # Released by _flush once the item's $inc is applied
+        self.counters.hold(self._chat_of(item))
+
+    @staticmethod
+    def _chat_of(item):
+        kind, payload, _ = item
+        if kind == "insert":
+            return payload['chat_id']
+        if kind == "added":
+            return payload
+        return payload[0]
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flusher and write out everything still queued"""
+        if self._task:
+            await self.queue.put(STOP)
+            await self._task
+            self._task = None
+        await self.flush()
+
+    async def flush(self):
+        """Write out everything queued so far, including a batch the
+        flusher has already taken and is still writing"""
+        if self._task is not None and not self._task.done():
+            # Goes through the queue, so the flusher resolves it only after
+            # writing every batch taken before it
+            done = asyncio.get_running_loop().create_future()
+            await self.queue.put((FLUSH, done, None))
+            await done
+            return
+
+        while not self.queue.empty():
+            batch = []
+            while not self.queue.empty() and len(batch) < self.batch_size:
+                item = self.queue.get_nowait()
+                if item[0] == FLUSH:
+                    item[1].set_result(None)
+                elif item is not STOP:
+                    batch.append(item)
+            await self._flush(batch)
+
+    async def _collect(self):
+        """Next batch, and the stop or flush marker that ended it (if any)"""
+        item = await self.queue.get()
+        if item is STOP or item[0] == FLUSH:
+            return [], item
+        batch = [item]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if item is STOP or item[0] == FLUSH:
+                return batch, item
+            batch.append(item)
+        return batch, None
+
+    async def _run(self):
+        while True:
+            batch, marker = await self._collect()
+            try:
+                await self._flush(batch)
+            except Exception as e:
+                log.warning(f"Flush of {len(batch)} items failed: {e}")
+            if marker is STOP:
+                return
+            if marker is not None and not marker[1].done():
+                marker[1].set_result(None)
+
+    def _build(self, batch):
+        """Split a batch into inserts, the counter deltas they carry,
+        deltas of requests written directly, and status transitions
+        {(chat_id, from_status, status): [user_id, ...]}"""
+        inserts = {}
+        operations = []
+        insert_deltas = defaultdict(lambda: defaultdict(int))
+        deltas = defaultdict(lambda: defaultdict(int))
+        transitions = defaultdict(list)
+
+        for kind, payload, _ in batch:
+            if kind == "insert":
+                doc = payload
+                operations.append(InsertOne(doc))
+                inserts[(doc['chat_id'], doc['user_id'])] = doc
+                insert_deltas[doc['chat_id']]["total_requests"] += 1
+                insert_deltas[doc['chat_id']]["pending_requests"] += 1
+                continue
+            if kind == "added":
+                deltas[payload]["total_requests"] += 1
+                deltas[payload]["pending_requests"] += 1
+                continue
+
+            chat_id, user_id, status, from_status = payload
+            doc = inserts.get((chat_id, user_id))
+            if doc is None or doc.get('status') != from_status:
+                transitions[(chat_id, from_status, status)].append(user_id)
+                continue
+
+            # Still unwritten: fold the transition into the insert
+            doc['status'] = status
+            if status == "accepted":
+                doc['accepted_date'] = datetime.utcnow()
+            if from_status in PENDING_STATUSES:
+                insert_deltas[chat_id]["pending_requests"] -= 1
+                if status == "accepted":
+                    insert_deltas[chat_id]["accepted_requests"] += 1
+
+        return operations, insert_deltas, deltas, transitions
+
+    async def _apply_transitions(self, transitions, deltas):
+        """One update_many per transition; counters follow modified_count"""
+        for (chat_id, from_status, status), user_ids in transitions.items():
+            try:
+                changed = await self.db.bulk_update_request_status(
+                    chat_id, status, user_ids=user_ids, from_status=from_status
+                )
+            except Exception as e:
+                log.warning(f"Status update of {len(user_ids)} requests failed: {e}")
+                continue
+            if changed and from_status in PENDING_STATUSES:
+                deltas[chat_id]["pending_requests"] -= changed
+                if status == "accepted":
+                    deltas[chat_id]["accepted_requests"] += changed
+
+    async def _flush(self, batch, attempts=3):
+        if not batch:
+            return
+        # Handler spans end at the enqueue; this one ties their traces to the write
+        traces = sorted({trace_id for _, _, trace_id in batch if trace_id})
+        try:
+            with span("write_buffer.flush", log, size=len(batch), traces=traces):
+                await self._write(batch, attempts)
+        finally:
+            for item in batch:
+                self.counters.release(self._chat_of(item))
+
+    async def _write(self, batch, attempts):
+        operations, insert_deltas, deltas, transitions = self._build(batch)
+
+        # Batches of only direct-write counts or transitions have no inserts,
+        # and bulk_write refuses an empty list
+        if operations:
+            for attempt in range(attempts):
+                try:
+                    started = time.monotonic()
+                    await self.db.requests.bulk_write(operations, ordered=False)
+                    mongo_op_seconds.observe(time.monotonic() - started, method="buffered_bulk_write")
+                except BulkWriteError as e:
+                    # Partial success; the counter reconciler repairs any drift
+                    log.warning(f"Bulk write had {len(e.details.get('writeErrors', []))} errors")
+                except Exception as e:
+                    # InsertOne stamped _id on each doc, so a retry cannot duplicate
+                    log.warning(f"Bulk write failed (attempt {attempt + 1}): {e}")
+                    if attempt < attempts - 1:
+                        await asyncio.sleep(2 ** attempt)
+                    continue
+                for chat_id, fields in insert_deltas.items():
+                    for field, delta in fields.items():
+                        deltas[chat_id][field] += delta
+                break
+
+        # After the inserts, so a transition can match a request inserted here
+        await self._apply_transitions(transitions, deltas)
+
+        try:
+            await self.counters.apply_deltas(deltas)
+        except Exception as e:
+            log.warning(f"Counter update failed: {e}")
+
+# Global instance
+write_buffer = WriteBuffer(db, counters)
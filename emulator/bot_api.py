@@ -0,0 +1,348 @@
+"""Local stand-in for the Telegram Bot API, for load and integration tests.
+
+Implements the methods the bot uses, keeps chats / members / pending join
+requests in memory and feeds updates to getUpdates. Latency, 429s and
+Telegram's own rate limits can be injected. Control endpoints under
+/emulator/ create chats and generate join-request bursts.
+
+    python -m emulator.bot_api --port 8081 --latency 0.03 --rate-429 0.01
+    BOT_API_SERVER=http://127.0.0.1:8081 python main.py
+    EMULATOR=1 python main.py   # both in one process, with fake userbot clients
+    curl -XPOST 'http://127.0.0.1:8081/emulator/chats?title=Load&type=channel'
+    curl -XPOST 'http://127.0.0.1:8081/emulator/join_requests?chat_id=-1001&count=5000'
+"""
+import argparse
+import asyncio
+import random
+import time
+import uuid
+from collections import defaultdict
+from aiohttp import web
+
+# Methods Telegram limits to ~1/s per chat
+CHAT_LIMITED = {"sendMessage", "editMessageText"}
+
+class TelegramError(Exception):
+    def __init__(self, code, description, retry_after=None):
+        super().__init__(description)
+        self.code = code
+        self.description = description
+        self.retry_after = retry_after
+
+class EmulatorState:
+    """Chats, members, pending join requests and the update queue.
+
+    Shared with the fake Telethon client so both transports see the same
+    world (a userbot HideAll clears what getChatMember reports, etc).
+    """
+
+    def __init__(self, bot_id=1, latency=0.0, jitter=0.0, rate_429=0.0, retry_after=1,
+                 flood_wait=0.0, flood_seconds=5, enforce_limits=False, global_limit=30, chat_limit=1):
+        self.bot_user = {"id": bot_id, "is_bot": True, "first_name": "AutoReq", "username": "autoreq_bot"}
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.flood_wait = flood_wait
+        self.flood_seconds = flood_seconds
+        self.enforce_limits = enforce_limits
+        self.global_limit = global_limit
+        self.chat_limit = chat_limit
+
+        self.chats = {}
+        self.invite_links = {}
+        self.updates = []
+        self.next_update_id = 1
+        self.next_message_id = 1
+        self.new_updates = asyncio.Event()
+        self.calls = defaultdict(int)
+        self.errors = defaultdict(int)
+        self._windows = defaultdict(int)
+
+    # --- world building -------------------------------------------------
+
+    @staticmethod
+    def user(user_id):
+        return {"id": user_id, "is_bot": False, "first_name": f"User{user_id}", "username": f"user{user_id}"}
+
+    def chat_object(self, chat_id):
+        chat = self.chats.get(chat_id)
+        if chat is None:
+            return {"id": chat_id, "type": "private", "first_name": f"User{chat_id}"}
+        return {"id": chat_id, "title": chat["title"], "type": chat["type"]}
+
+    def push_update(self, **payload):
+        self.updates.append({"update_id": self.next_update_id, **payload})
+        self.next_update_id += 1
+        self.new_updates.set()
+
+    def add_chat(self, title, chat_type="channel", added_by=1, bot_admin=True):
+        chat_id = -1000000000000 - len(self.chats) - 1
+        bot_member = {"user": self.bot_user, "status": "administrator" if bot_admin else "member"}
+        if bot_admin:
+            bot_member.update(can_promote_members=True, can_invite_users=True, can_manage_chat=True,
+                              can_delete_messages=True, can_restrict_members=True, can_pin_messages=True)
+        self.chats[chat_id] = {
+            "title": title,
+            "type": chat_type,
+            "members": {self.bot_user["id"]: bot_member},
+            "pending": {},
+        }
+        self.push_update(my_chat_member={
+            "chat": self.chat_object(chat_id),
+            "from": self.user(added_by),
+            "date": int(time.time()),
+            "old_chat_member": {"user": self.bot_user, "status": "left"},
+            "new_chat_member": bot_member,
+        })
+        return chat_id
+
+    def add_join_requests(self, chat_id, count, first_user_id=100000):
+        chat = self.chats[chat_id]
+        for user_id in range(first_user_id, first_user_id + count):
+            chat["pending"][user_id] = self.user(user_id)
+            self.push_update(chat_join_request={
+                "chat": self.chat_object(chat_id),
+                "from": self.user(user_id),
+                "user_chat_id": user_id,
+                "date": int(time.time()),
+            })
+
+    def approve(self, chat_id, user_id):
+        chat = self._chat(chat_id)
+        if chat["pending"].pop(user_id, None) is None:
+            raise TelegramError(400, "Bad Request: HIDE_REQUESTER_MISSING")
+        chat["members"][user_id] = {"user": self.user(user_id), "status": "member"}
+
+    def _chat(self, chat_id):
+        chat = self.chats.get(int(chat_id))
+        if chat is None:
+            raise TelegramError(400, "Bad Request: chat not found")
+        return chat
+
+    # --- fault injection ------------------------------------------------
+
+    def _over(self, key, limit):
+        window = (key, int(time.monotonic()))
+        self._windows[window] += 1
+        if len(self._windows) > 10000:
+            now = int(time.monotonic())
+            self._windows = defaultdict(int, {k: v for k, v in self._windows.items() if k[1] >= now - 1})
+        return self._windows[window] > limit
+
+    async def before_call(self, method, chat_id=None):
+        """Simulate latency and decide whether this call gets a 429"""
+        self.calls[method] += 1
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay:
+            await asyncio.sleep(delay)
+        if self.enforce_limits:
+            limited = self._over("global", self.global_limit)
+            if not limited and chat_id is not None and method in CHAT_LIMITED:
+                limited = self._over(("chat", chat_id), self.chat_limit)
+            if limited:
+                self.errors[method] += 1
+                raise TelegramError(429, f"Too Many Requests: retry after {self.retry_after}", self.retry_after)
+        if self.rate_429 and random.random() < self.rate_429:
+            self.errors[method] += 1
+            raise TelegramError(429, f"Too Many Requests: retry after {self.retry_after}", self.retry_after)
+
+# --- Bot API methods ------------------------------------------------------
+
+def _int(value):
+    return int(value) if value is not None else None
+
+async def get_me(state, params):
+    return state.bot_user
+
+async def get_updates(state, params):
+    offset = _int(params.get("offset")) or 0
+    timeout = float(params.get("timeout") or 0)
+    limit = _int(params.get("limit")) or 100
+    # Confirmed updates are gone for good, as on Telegram
+    state.updates = [u for u in state.updates if u["update_id"] >= offset]
+    if not state.updates and timeout:
+        state.new_updates.clear()
+        try:
+            await asyncio.wait_for(state.new_updates.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+    return state.updates[:limit]
+
+async def approve_chat_join_request(state, params):
+    state.approve(int(params["chat_id"]), int(params["user_id"]))
+    return True
+
+async def decline_chat_join_request(state, params):
+    chat = state._chat(params["chat_id"])
+    if chat["pending"].pop(int(params["user_id"]), None) is None:
+        raise TelegramError(400, "Bad Request: HIDE_REQUESTER_MISSING")
+    return True
+
+async def get_chat_member(state, params):
+    chat = state._chat(params["chat_id"])
+    user_id = int(params["user_id"])
+    return chat["members"].get(user_id, {"user": state.user(user_id), "status": "left"})
+
+async def promote_chat_member(state, params):
+    chat = state._chat(params["chat_id"])
+    bot_member = chat["members"].get(state.bot_user["id"], {})
+    if not bot_member.get("can_promote_members"):
+        raise TelegramError(400, "Bad Request: not enough rights")
+    user_id = int(params["user_id"])
+    if user_id not in chat["members"]:
+        raise TelegramError(400, "Bad Request: USER_NOT_PARTICIPANT")
+    rights = {k: v in (True, "true", "True", "1") for k, v in params.items() if k.startswith("can_")}
+    chat["members"][user_id] = {"user": state.user(user_id), "status": "administrator", **rights}
+    return True
+
+async def set_custom_title(state, params):
+    state._chat(params["chat_id"])
+    return True
+
+async def create_chat_invite_link(state, params):
+    chat_id = int(params["chat_id"])
+    state._chat(chat_id)
+    invite_hash = uuid.uuid4().hex[:16]
+    state.invite_links[invite_hash] = chat_id
+    return {
+        "invite_link": f"https://t.me/+{invite_hash}",
+        "creator": state.bot_user,
+        "creates_join_request": params.get("creates_join_request") in (True, "true", "True"),
+        "is_primary": False,
+        "is_revoked": False,
+        "name": params.get("name"),
+    }
+
+async def send_message(state, params):
+    message_id = state.next_message_id
+    state.next_message_id += 1
+    return {
+        "message_id": message_id,
+        "date": int(time.time()),
+        "chat": state.chat_object(int(params["chat_id"])),
+        "text": params.get("text", ""),
+    }
+
+async def edit_message_text(state, params):
+    if "inline_message_id" in params:
+        return True
+    return {
+        "message_id": int(params["message_id"]),
+        "date": int(time.time()),
+        "chat": state.chat_object(int(params["chat_id"])),
+        "text": params.get("text", ""),
+    }
+
+async def accept_anything(state, params):
+    return True
+
+METHODS = {
+    "getMe": get_me,
+    "getUpdates": get_updates,
+    "approveChatJoinRequest": approve_chat_join_request,
+    "declineChatJoinRequest": decline_chat_join_request,
+    "getChatMember": get_chat_member,
+    "promoteChatMember": promote_chat_member,
+    "setChatAdministratorCustomTitle": set_custom_title,
+    "createChatInviteLink": create_chat_invite_link,
+    "sendMessage": send_message,
+    "editMessageText": edit_message_text,
+    "answerCallbackQuery": accept_anything,
+    "deleteWebhook": accept_anything,
+    "setWebhook": accept_anything,
+    "setMyCommands": accept_anything,
+}
+
+# --- HTTP layer -------------------------------------------------------------
+
+async def _params(request):
+    params = dict(request.query)
+    if request.content_type == "application/json":
+        params.update(await request.json())
+    elif request.can_read_body:
+        params.update(await request.post())
+    return params
+
+async def handle_method(request):
+    state = request.app["state"]
+    method = request.match_info["method"]
+    handler = METHODS.get(method)
+    if handler is None:
+        return web.json_response({"ok": False, "error_code": 404, "description": "Not Found: method not found"}, status=404)
+
+    params = await _params(request)
+    try:
+        if method != "getUpdates":
+            await state.before_call(method, params.get("chat_id"))
+        result = await handler(state, params)
+    except TelegramError as e:
+        body = {"ok": False, "error_code": e.code, "description": e.description}
+        if e.retry_after:
+            body["parameters"] = {"retry_after": e.retry_after}
+        return web.json_response(body, status=e.code)
+    return web.json_response({"ok": True, "result": result})
+
+async def control_chats(request):
+    state = request.app["state"]
+    params = await _params(request)
+    chat_id = state.add_chat(
+        params.get("title", "Emulated chat"),
+        params.get("type", "channel"),
+        added_by=int(params.get("added_by", 1)),
+        bot_admin=params.get("bot_admin", "true") != "false",
+    )
+    return web.json_response({"chat_id": chat_id})
+
+async def control_join_requests(request):
+    state = request.app["state"]
+    params = await _params(request)
+    chat_id = int(params["chat_id"])
+    count = int(params.get("count", 1))
+    state.add_join_requests(chat_id, count, int(params.get("first_user_id", 100000)))
+    return web.json_response({"chat_id": chat_id, "queued": count})
+
+async def control_stats(request):
+    state = request.app["state"]
+    return web.json_response({
+        "calls": state.calls,
+        "errors": state.errors,
+        "pending_updates": len(state.updates),
+        "chats": {
+            str(chat_id): {"title": chat["title"], "members": len(chat["members"]), "pending": len(chat["pending"])}
+            for chat_id, chat in state.chats.items()
+        },
+    })
+
+def create_app(state=None):
+    app = web.Application()
+    app["state"] = state or EmulatorState()
+    app.router.add_route("*", "/bot{token}/{method}", handle_method)
+    app.router.add_post("/emulator/chats", control_chats)
+    app.router.add_post("/emulator/join_requests", control_join_requests)
+    app.router.add_get("/emulator/stats", control_stats)
+    return app
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local Telegram Bot API emulator")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--bot-id", type=int, default=1, help="must match the BOT_TOKEN prefix")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every call")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random extra latency, up to this")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="probability of a random 429")
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--enforce-limits", action="store_true", help="429 above Telegram's global/per-chat limits")
+    parser.add_argument("--flood-wait", type=float, default=0.0, help="probability of a userbot FloodWait")
+    parser.add_argument("--flood-seconds", type=int, default=5, help="seconds a FloodWait asks for")
+    args = parser.parse_args(argv)
+
+    state = EmulatorState(
+        bot_id=args.bot_id, latency=args.latency, jitter=args.jitter,
+        rate_429=args.rate_429, retry_after=args.retry_after, enforce_limits=args.enforce_limits,
+        flood_wait=args.flood_wait, flood_seconds=args.flood_seconds
+    )
+    web.run_app(create_app(state), host=args.host, port=args.port)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""In-process stand-in for the Telethon client UserBotClient drives.
+
+Answers the MTProto requests used in userbot/client.py against the same
+EmulatorState as the Bot API emulator, with injectable latency and
+FloodWaits. Calls go through the userbot RateLimiter like the real
+RateLimitedTelegramClient, so pacing and backoff can be load-tested.
+
+    state = EmulatorState(latency=0.05, flood_wait=0.02, flood_seconds=3)
+    await userbot_client.start(clients=[FakeTelegramClient(state), FakeTelegramClient(state, user_id=3)])
+"""
+import asyncio
+import random
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from telethon import utils as telethon_utils
+from telethon.errors import (
+    ChannelPrivateError, FloodWaitError, HideRequesterMissingError,
+    InviteHashInvalidError, UserAlreadyParticipantError
+)
+from telethon.tl.types import InputPeerChannel, PeerChannel
+from utils.rate_limiter import userbot_limiter
+from userbot.client import RateLimitedTelegramClient
+
+class FakeTelegramClient:
+    def __init__(self, state, user_id=2, limiter=None):
+        self.state = state
+        self.me = SimpleNamespace(id=user_id, username="autoreq_userbot", first_name="Userbot", phone="0")
+        self.limiter = limiter or userbot_limiter
+        self.on_flood = None
+        self.connected = False
+
+    async def start(self):
+        self.connected = True
+        return self
+
+    async def disconnect(self):
+        self.connected = False
+
+    def is_connected(self):
+        return self.connected
+
+    async def get_me(self):
+        return self.me
+
+    # --- entities ---------------------------------------------------------
+
+    @staticmethod
+    def _channel_id(chat_id):
+        real_id, peer_type = telethon_utils.resolve_id(int(chat_id))
+        if peer_type is not PeerChannel:
+            raise ValueError(f"Could not find the input entity for {chat_id}")
+        return real_id
+
+    def _chat(self, peer, request=None):
+        chat_id = telethon_utils.get_peer_id(peer)
+        chat = self.state.chats.get(chat_id)
+        if chat is None or self.me.id not in chat["members"]:
+            raise ChannelPrivateError(request)
+        return chat_id, chat
+
+    async def get_input_entity(self, peer):
+        if isinstance(peer, InputPeerChannel):
+            return peer
+        channel_id = self._channel_id(peer)
+        chat = self.state.chats.get(int(peer))
+        if chat is None or self.me.id not in chat["members"]:
+            raise ValueError(f"Could not find the input entity for {peer}")
+        return InputPeerChannel(channel_id=channel_id, access_hash=channel_id * 7919)
+
+    async def get_entity(self, peer):
+        entity = await self.get_input_entity(peer)
+        chat_id, chat = self._chat(entity)
+        return SimpleNamespace(
+            id=entity.channel_id,
+            title=chat["title"],
+            username=None,
+            participants_count=len(chat["members"]),
+            broadcast=chat["type"] == "channel",
+        )
+
+    async def join_chat(self, link):
+        raise InviteHashInvalidError(None)
+
+    # --- requests ---------------------------------------------------------
+
+    async def __call__(self, request, ordered=False, flood_sleep_threshold=None):
+        method = type(request).__name__
+        chat_id = RateLimitedTelegramClient._chat_of(request)
+        await self.limiter.acquire(method, chat_id)
+        try:
+            return await self._invoke(method, request)
+        except FloodWaitError as e:
+            self.limiter.backoff(method, chat_id, e.seconds)
+            if self.on_flood:
+                self.on_flood(e.seconds)
+            raise
+
+    async def _invoke(self, method, request):
+        state = self.state
+        state.calls[f"mtproto.{method}"] += 1
+        delay = state.latency + random.uniform(0, state.jitter)
+        if delay:
+            await asyncio.sleep(delay)
+        if state.flood_wait and random.random() < state.flood_wait:
+            state.errors[f"mtproto.{method}"] += 1
+            raise FloodWaitError(request, capture=state.flood_seconds)
+
+        handler = getattr(self, f"_{method}", None)
+        if handler is None:
+            raise NotImplementedError(f"Emulator does not implement {method}")
+        return handler(request)
+
+    def _ImportChatInviteRequest(self, request):
+        chat_id = self.state.invite_links.get(request.hash)
+        if chat_id is None:
+            raise InviteHashInvalidError(request)
+        state_chat = self.state.chats[chat_id]
+        if self.me.id in state_chat["members"]:
+            raise UserAlreadyParticipantError(request)
+        state_chat["members"][self.me.id] = {"user": self.state.user(self.me.id), "status": "member"}
+        return SimpleNamespace(chats=[SimpleNamespace(id=self._channel_id(chat_id), title=state_chat["title"])])
+
+    def _HideChatJoinRequestRequest(self, request):
+        chat_id, chat = self._chat(request.peer, request)
+        user_id = request.user_id if isinstance(request.user_id, int) else getattr(request.user_id, "user_id", None)
+        if user_id not in chat["pending"]:
+            raise HideRequesterMissingError(request)
+        if request.approved:
+            self.state.approve(chat_id, user_id)
+        else:
+            chat["pending"].pop(user_id)
+        return SimpleNamespace(updates=[], users=[], chats=[])
+
+    def _HideAllChatJoinRequestsRequest(self, request):
+        chat_id, chat = self._chat(request.peer, request)
+        for user_id in list(chat["pending"]):
+            if request.approved:
+                self.state.approve(chat_id, user_id)
+            else:
+                chat["pending"].pop(user_id)
+        return SimpleNamespace(updates=[], users=[], chats=[])
+
+    def _InviteToChannelRequest(self, request):
+        chat_id, chat = self._chat(request.channel, request)
+        users = []
+        for user in request.users:
+            user_id = user if isinstance(user, int) else getattr(user, "user_id", None)
+            chat["pending"].pop(user_id, None)
+            chat["members"][user_id] = {"user": self.state.user(user_id), "status": "member"}
+            users.append(SimpleNamespace(id=user_id))
+        return SimpleNamespace(updates=[], users=users, chats=[])
+
+    def _GetChatInviteImportersRequest(self, request):
+        chat_id, chat = self._chat(request.peer, request)
+        user_ids = sorted(chat["pending"]) if request.requested else []
+        after = getattr(request.offset_user, "user_id", None)
+        if after is not None:
+            user_ids = [user_id for user_id in user_ids if user_id > after]
+        page = user_ids[:request.limit]
+        now = datetime.now(timezone.utc)
+        return SimpleNamespace(
+            count=len(chat["pending"]),
+            importers=[SimpleNamespace(user_id=user_id, date=now, requested=True) for user_id in page],
+            users=[
+                SimpleNamespace(id=user_id, access_hash=user_id * 7919, username=f"user{user_id}", first_name=f"User{user_id}")
+                for user_id in page
+            ]
+        )
@@ -5,8 +5,14 @@ from aiogram.enums import ParseMode
 from database.operations import db
 from ui.buttons import ButtonManager
 from userbot.client import userbot_client
+from services.dashboard import dashboard
+from services.user_summary import user_summaries
+from services.backlog import backlog
+from services.audit import audit
+from utils.background import jobs
 from config import config
 import asyncio
+import time
 
 router = Router()
 
@@ -19,9 +25,11 @@ async def manage_handler(message: Message):
     user_id = message.from_user.id
     
     # Get chats added by this user
-    user_chats = list(db.chats.find({"added_by": user_id}))
+    summary = await user_summaries.get(user_id)
+    groups = summary['groups']
+    channels = summary['channels']
     
-    if not user_chats:
+    if not groups and not channels:
         manage_text = """
 <b>Chat Management</b>
 
@@ -41,9 +49,7 @@ Then use /manage to control your chats.
         return
     
     # Show user's chats
-    total_chats = len(user_chats)
-    groups = [c for c in user_chats if c['chat_type'] == 'group']
-    channels = [c for c in user_chats if c['chat_type'] == 'channel']
+    total_chats = len(groups) + len(channels)
     
     manage_text = f"""
 <b>Your Chat Management</b>
@@ -67,17 +73,14 @@ async def db_handler(message: Message):
     if message.from_user.id != config.OWNER_ID:
         return await message.answer("Owner only command")
     
-    all_chats = db.get_all_chats()
-    total_chats = len(all_chats)
-    groups = [c for c in all_chats if c['chat_type'] == 'group']
-    channels = [c for c in all_chats if c['chat_type'] == 'channel']
+    summary = await dashboard.get_summary()
     
     stats_text = f"""
 <b>Database Management (Owner)</b>
 
-<b>Total Groups:</b> {len(groups)}
-<b>Total Channels:</b> {len(channels)}
-<b>Total Chats:</b> {total_chats}
+<b>Total Groups:</b> {summary['groups']}
+<b>Total Channels:</b> {summary['channels']}
+<b>Total Chats:</b> {summary['total']}
 """
     
     await message.answer(
@@ -91,18 +94,17 @@ async def stats_handler(message: Message):
     if message.from_user.id != config.OWNER_ID:
         return
     
-    all_chats = db.get_all_chats()
-    groups = [chat for chat in all_chats if chat['chat_type'] == 'group']
-    channels = [chat for chat in all_chats if chat['chat_type'] == 'channel']
+    summary = await dashboard.get_summary()
     
     stats_text = f"""
 <b>Overall Statistics (Owner)</b>
 
-<b>Groups:</b> {len(groups)}
-<b>Channels:</b> {len(channels)}
-<b>Total Chats:</b> {len(all_chats)}
+<b>Groups:</b> {summary['groups']}
+<b>Channels:</b> {summary['channels']}
+<b>Total Chats:</b> {summary['total']}
 
-<b>Active Chats:</b> {len([c for c in all_chats if c.get('is_active', True)])}
+<b>Active Chats:</b> {summary['active']}
+<b>Unhealthy Chats:</b> {summary['unhealthy']} (as of last /audit)
 """
     
     await message.answer(stats_text, parse_mode=ParseMode.HTML)
@@ -112,9 +114,13 @@ async def debug_handler(message: Message):
     if message.from_user.id != config.OWNER_ID:
         return
     
-    all_chats = db.get_all_chats()
-    total_chats = len(all_chats)
-    active_chats = len([c for c in all_chats if c.get('is_active', True)])
+    summary = await dashboard.get_summary()
+    total_chats = summary['total']
+    active_chats = summary['active']
+    cache = userbot_client.entity_stats()
+    sessions = userbot_client.sessions
+    connected = sum(session.is_connected for session in sessions)
+    flooded = sum(session.flooded() for session in sessions)
     
     debug_text = f"""
 <b>Debug Information</b>
@@ -122,15 +128,114 @@ async def debug_handler(message: Message):
 <b>Total Chats in DB:</b> {total_chats}
 <b>Active Chats:</b> {active_chats}
 <b>Bot Status:</b> Running
-<b>Userbot Status:</b> {'Connected' if userbot_client.is_connected else 'Disconnected'}
+<b>Userbot Status:</b> {'Connected' if userbot_client.is_connected else 'Disconnected'} ({connected}/{len(sessions)} sessions, {flooded} in FloodWait)
+<b>Entity Cache:</b> {cache['hits']} hits / {cache['misses']} misses ({cache['size']} cached)
 
 <b>Recent Chats:</b>
 """
     
-    for chat in all_chats[-5:]:
+    for chat in summary['recent']:
         status = "Active" if chat.get('is_active', True) else "Inactive"
         debug_text += f"• {chat['title']} ({chat['chat_type']}) - {status}\n"
     
     await message.answer(debug_text, parse_mode=ParseMode.HTML)
 
+@router.message(Command("reconcile"))
+async def reconcile_handler(message: Message):
+    """Owner-only: pull join requests missed while the bot was down"""
+    if message.from_user.id != config.OWNER_ID:
+        return
+    
+    if not userbot_client.is_connected:
+        return await message.answer("Userbot is not connected.")
+    if jobs.running("reconcile"):
+        return await message.answer("A reconciliation is already running.")
+    
+    status = await message.answer("Reconciling pending join requests...")
+    # Runs for minutes: keep this chat's later commands flowing
+    jobs.start("reconcile", run_reconcile(status))
+
+async def run_reconcile(status: Message):
+    last_edit = 0.0
+    
+    async def on_progress(summary):
+        nonlocal last_edit
+        if time.monotonic() - last_edit < config.APPROVAL_PROGRESS_INTERVAL:
+            return
+        last_edit = time.monotonic()
+        await status.edit_text(
+            f"Reconciling... {summary['done']}/{summary['chats']} chats\n"
+            f"Missing requests found: {summary['added']}"
+        )
+    
+    summary = await backlog.run(on_progress=on_progress)
+    if summary is None:
+        return await status.edit_text("A reconciliation is already running.")
+    
+    await status.edit_text(
+        f"<b>Backlog reconciled</b>\n\n"
+        f"<b>Chats:</b> {summary['done']} ({summary['failed']} failed)\n"
+        f"<b>Pending on Telegram:</b> {summary['found']}\n"
+        f"<b>Missing, now queued:</b> {summary['added']}",
+        parse_mode=ParseMode.HTML
+    )
+
+@router.message(Command("audit"))
+async def audit_handler(message: Message):
+    """Owner-only: check bot/userbot permissions in every active chat"""
+    if message.from_user.id != config.OWNER_ID:
+        return
+    
+    if jobs.running("audit"):
+        return await message.answer("An audit is already running.")
+    
+    status = await message.answer("Auditing active chats...")
+    jobs.start("audit", run_audit(status))
+
+async def run_audit(status: Message):
+    last_edit = 0.0
+    
+    async def on_progress(summary):
+        nonlocal last_edit
+        if time.monotonic() - last_edit < config.APPROVAL_PROGRESS_INTERVAL:
+            return
+        last_edit = time.monotonic()
+        await status.edit_text(
+            f"Auditing... {summary['done']}/{summary['chats']} chats\n"
+            f"Unhealthy so far: {summary['unhealthy']}"
+        )
+    
+    try:
+        summary = await audit.run(on_progress=on_progress)
+    except Exception as e:
+        return await status.edit_text(f"Audit failed: {e}")
+    if summary is None:
+        return await status.edit_text("An audit is already running.")
+    dashboard.invalidate()
+    
+    text = (
+        f"<b>Audit finished</b>\n\n"
+        f"<b>Chats:</b> {summary['done']}\n"
+        f"<b>Healthy:</b> {summary['healthy']}\n"
+        f"<b>Unhealthy:</b> {summary['unhealthy']} ({summary['errors']} unreachable)\n"
+    )
+    unhealthy = await db.get_unhealthy_chats(limit=10)
+    for chat in unhealthy:
+        health = chat['health']
+        problems = []
+        if health.get('error'):
+            problems.append(health['error'][:60])
+        else:
+            if not health.get('bot_admin'):
+                problems.append("bot not admin")
+            elif not health.get('can_invite'):
+                problems.append("no invite rights")
+            if health.get('userbot_present') is False:
+                problems.append("userbot missing")
+            elif health.get('userbot_admin') is False:
+                problems.append("userbot not admin")
+        text += f"\n• {chat.get('title', 'Unknown')} (<code>{chat['chat_id']}</code>): {', '.join(problems)}"
+    
+    await status.edit_text(text, parse_mode=ParseMode.HTML)
+
 # ... (keep all the other handlers you have for setup, check_permissions, etc.)
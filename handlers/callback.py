@@ -1,11 +1,18 @@
 from aiogram import Router, F
 from aiogram.types import CallbackQuery
 from aiogram.enums import ParseMode
+from bson.errors import InvalidId
 from database.operations import db
+from database.counters import counters
+from database.write_buffer import write_buffer
 from ui.buttons import ButtonManager
 from userbot.client import userbot_client
+from services.approval import ApprovalEngine
+from services.dashboard import dashboard
+from services.user_summary import user_summaries
 from config import config  # ADD THIS LINE
-import asyncio
+from utils.scheduler import lane, BULK
+from utils.background import jobs
 
 router = Router()
 
@@ -13,17 +20,16 @@ router = Router()
 @router.callback_query(F.data == "my_main")
 async def my_main_callback(callback: CallbackQuery):
     user_id = callback.from_user.id
-    user_chats = list(db.chats.find({"added_by": user_id}))
-    
-    groups = [c for c in user_chats if c['chat_type'] == 'group']
-    channels = [c for c in user_chats if c['chat_type'] == 'channel']
+    summary = await user_summaries.get(user_id)
+    groups = summary['groups']
+    channels = summary['channels']
     
     text = f"""
 <b>📊 Your Chat Management</b>
 
 <b>Your Groups:</b> {len(groups)}
 <b>Your Channels:</b> {len(channels)}
-<b>Total Chats:</b> {len(user_chats)}
+<b>Total Chats:</b> {len(groups) + len(channels)}
 
 Select an option below to manage:
 """
@@ -49,12 +55,16 @@ async def my_category_callback(callback: CallbackQuery):
         return
     
     # Get only user's chats
-    user_chats = list(db.chats.find({
-        "added_by": user_id,
-        "chat_type": chat_type
-    }))
+    summary = await user_summaries.get(user_id)
+    if not summary[f"{chat_type}s"]:
+        # Known empty: skip the list query
+        await callback.message.edit_text(
+            "No chats found.",
+            reply_markup=ButtonManager.back_button("my_main")
+        )
+        return
     
-    await show_chat_list(callback, user_chats, list_type, 0, is_owner=False)
+    await show_chat_list(callback, list_type, is_owner=False)
 
 # Owner management callbacks
 @router.callback_query(F.data == "db_main")
@@ -63,16 +73,14 @@ async def db_main_callback(callback: CallbackQuery):
         await callback.answer("Owner only!", show_alert=True)
         return
     
-    all_chats = db.get_all_chats()
-    groups = [c for c in all_chats if c['chat_type'] == 'group']
-    channels = [c for c in all_chats if c['chat_type'] == 'channel']
+    summary = await dashboard.get_summary()
     
     text = f"""
 <b>📊 Database Management (Owner)</b>
 
-<b>Total Groups:</b> {len(groups)}
-<b>Total Channels:</b> {len(channels)}
-<b>Total Chats:</b> {len(all_chats)}
+<b>Total Groups:</b> {summary['groups']}
+<b>Total Channels:</b> {summary['channels']}
+<b>Total Chats:</b> {summary['total']}
 """
     
     await callback.message.edit_text(
@@ -89,10 +97,8 @@ async def db_category_callback(callback: CallbackQuery):
     
     data = callback.data
     if data == "db_groups":
-        chat_type = "group"
         list_type = "db_groups"
     elif data == "db_channels":
-        chat_type = "channel"
         list_type = "db_channels"
     elif data == "db_users":
         await show_user_stats(callback)
@@ -100,38 +106,39 @@ async def db_category_callback(callback: CallbackQuery):
     else:
         return
     
-    all_chats = db.get_chats_by_type(chat_type)
-    await show_chat_list(callback, all_chats, list_type, 0, is_owner=True)
+    await show_chat_list(callback, list_type, is_owner=True)
 
 @router.callback_query(F.data.startswith("list_"))
 async def list_page_callback(callback: CallbackQuery):
+    # list_<my|db>_<groups|channels>_<n|p>_<cursor>
     parts = callback.data.split("_")
+    if len(parts) != 5 or parts[1] not in ("my", "db") or parts[2] not in ("groups", "channels"):
+        await callback.answer("Unknown list, please reopen it.")
+        return
     list_type = f"{parts[1]}_{parts[2]}"  # my_groups, db_channels, etc
-    page = int(parts[3])
+    direction, cursor = parts[3], parts[4]
+    if direction not in ("n", "p"):
+        # Old or tampered button: start over from the first page
+        direction, cursor = None, None
+    after = cursor if direction == "n" else None
+    before = cursor if direction == "p" else None
     
-    if list_type.startswith("my_"):
-        # User's chats
-        user_id = callback.from_user.id
-        chat_type = list_type.replace("my_", "")
-        user_chats = list(db.chats.find({
-            "added_by": user_id,
-            "chat_type": chat_type
-        }))
-        await show_chat_list(callback, user_chats, list_type, page, is_owner=False)
-    else:
+    is_owner = not list_type.startswith("my_")
+    if is_owner and callback.from_user.id != config.OWNER_ID:
         # Owner's all chats
-        if callback.from_user.id != config.OWNER_ID:
-            await callback.answer("Owner only!", show_alert=True)
-            return
-        
-        chat_type = list_type.replace("db_", "")
-        all_chats = db.get_chats_by_type(chat_type)
-        await show_chat_list(callback, all_chats, list_type, page, is_owner=True)
+        await callback.answer("Owner only!", show_alert=True)
+        return
+    
+    try:
+        await show_chat_list(callback, list_type, after, before, is_owner=is_owner)
+    except InvalidId:
+        await callback.answer()
+        await show_chat_list(callback, list_type, is_owner=is_owner)
 
 @router.callback_query(F.data.startswith("chat_"))
 async def chat_detail_callback(callback: CallbackQuery):
     chat_id = callback.data.replace("chat_", "")
-    chat = db.get_chat(chat_id)
+    chat = await db.get_chat(chat_id)
     
     if not chat:
         await callback.answer("Chat not found!", show_alert=True)
@@ -146,7 +153,7 @@ async def chat_detail_callback(callback: CallbackQuery):
         await callback.answer("You don't have permission to view this chat!", show_alert=True)
         return
     
-    stats = db.get_chat_stats(chat_id)
+    stats = await db.get_chat_stats(chat_id)
     
     text = f"""
 <b>Chat Details</b>
@@ -169,7 +176,13 @@ Accepted: {stats['accepted_requests']}
         parse_mode=ParseMode.HTML
     )
 
-async def show_chat_list(callback: CallbackQuery, chats, list_type: str, page: int = 0, is_owner: bool = False):
+async def show_chat_list(callback: CallbackQuery, list_type: str, after: str = None, before: str = None, is_owner: bool = False):
+    chat_type = list_type.split("_")[1].rstrip("s")  # my_groups -> group
+    query = {"chat_type": chat_type}
+    if list_type.startswith("my_"):
+        query["added_by"] = callback.from_user.id
+    
+    chats, has_prev, has_next = await db.get_chats_page(query, after, before)
     if not chats:
         await callback.message.edit_text(
             f"No chats found.",
@@ -178,12 +191,11 @@ async def show_chat_list(callback: CallbackQuery, chats, list_type: str, page: i
         return
     
     prefix = "Your" if list_type.startswith("my_") else "All"
-    chat_type = list_type.replace("my_", "").replace("db_", "")
     
     text = f"<b>{prefix} {chat_type.title()}s</b>\n\nSelect a chat to view details:"
     await callback.message.edit_text(
         text,
-        reply_markup=ButtonManager.chat_list(chats, page, list_type),
+        reply_markup=ButtonManager.chat_list(chats, list_type, has_prev, has_next),
         parse_mode=ParseMode.HTML
     )
 
@@ -192,40 +204,104 @@ async def show_user_stats(callback: CallbackQuery):
         return
     
     # Get all unique users who added the bot
-    pipeline = [
-        {"$group": {"_id": "$added_by", "count": {"$sum": 1}}},
-        {"$sort": {"count": -1}}
-    ]
-    user_stats = list(db.chats.aggregate(pipeline))
+    user_stats = await db.get_user_chat_counts(limit=10)
     
     text = "<b>👥 User Statistics</b>\n\n"
-    for stat in user_stats[:10]:  # Top 10 users
+    for stat in user_stats:  # Top 10 users
         text += f"User {stat['_id']}: {stat['count']} chats\n"
     
     await callback.message.edit_text(text, parse_mode=ParseMode.HTML)
 
+@router.callback_query(F.data.startswith("remove_"))
+async def remove_chat_callback(callback: CallbackQuery):
+    if callback.from_user.id != config.OWNER_ID:
+        await callback.answer("Owner only!", show_alert=True)
+        return
+    
+    chat_id = callback.data.replace("remove_", "")
+    chat = await db.remove_chat(chat_id)
+    if not chat:
+        await callback.answer("Chat not found!", show_alert=True)
+        return
+    
+    user_summaries.remove_chat(chat['added_by'], chat['chat_id'], chat['chat_type'])
+    dashboard.invalidate()
+    
+    await callback.message.edit_text(
+        f"Removed {chat['title']} from the database.",
+        reply_markup=ButtonManager.back_button("db_main")
+    )
+
 @router.callback_query(F.data.startswith("accept_all_"))
 async def accept_all_callback(callback: CallbackQuery):
     chat_id = callback.data.replace("accept_all_", "")
-    await accept_all_requests(callback, chat_id)
+    key = f"accept_all_{chat_id}"
+    if jobs.running(key):
+        await callback.answer("Already accepting requests in this chat.", show_alert=True)
+        return
+    # Runs for minutes: keep this chat's later buttons and commands flowing
+    jobs.start(key, accept_all_requests(callback, chat_id))
 
 async def accept_all_requests(callback: CallbackQuery, chat_id: str):
     await callback.message.edit_text("Starting to accept all requests...")
     
-    pending_requests = db.get_pending_requests(chat_id)
+    # Make sure buffered requests are in the DB before reconciling in bulk
+    await write_buffer.flush()
+    
+    # Snapshot before approving: requests arriving meanwhile are not ours
+    pending_requests = await db.get_pending_requests(chat_id)
     if not pending_requests:
         await callback.message.edit_text("No pending requests found.")
         return
+    user_ids = [request['user_id'] for request in pending_requests]
+    
+    # Fast path: one call approves the whole backlog
+    with lane(BULK):
+        bulk_accepted = await userbot_client.accept_all_join_requests(int(chat_id))
+    if bulk_accepted:
+        with counters.changing(chat_id):
+            accepted = await db.bulk_update_request_status(chat_id, "accepted", user_ids=user_ids)
+            await counters.request_accepted(chat_id, accepted)
+        await callback.message.edit_text(f"Accepted {accepted} requests successfully.")
+        return
     
-    success_count = 0
-    for request in pending_requests:
-        try:
-            result = await userbot_client.accept_join_request(int(chat_id), request['user_id'])
-            if result:
-                db.update_request_status(chat_id, request['user_id'], "accepted")
-                success_count += 1
-                await asyncio.sleep(1)  # Rate limit
-        except Exception as e:
-            print(f"Error accepting request: {e}")
+    # Fallback: batched invites, then per-user approval for the rest
+    with lane(BULK):
+        invited = await userbot_client.invite_users(int(chat_id), user_ids)
+    if invited:
+        with counters.changing(chat_id):
+            accepted = await db.bulk_update_request_status(chat_id, "accepted", user_ids=invited)
+            await counters.request_accepted(chat_id, accepted)
+    invited = set(invited)
+    remaining = [user_id for user_id in user_ids if user_id not in invited]
+    if not remaining:
+        await callback.message.edit_text(f"Accepted {len(invited)} requests successfully.")
+        return
+    
+    async def on_accepted(user_id):
+        await write_buffer.update_status(chat_id, user_id, "accepted")
+    
+    async def on_dead(user_id):
+        await write_buffer.update_status(chat_id, user_id, "dead")
+    
+    async def on_progress(summary):
+        done = summary['accepted'] + summary['failed']
+        await callback.message.edit_text(
+            f"Accepting requests... {done}/{summary['total']}\n"
+            f"Accepted: {summary['accepted']} | Failed: {summary['failed']}"
+        )
+    
+    engine = ApprovalEngine(userbot_client.accept_join_request)
+    summary = await engine.run(
+        chat_id,
+        remaining,
+        on_accepted=on_accepted,
+        on_progress=on_progress,
+        on_dead=on_dead
+    )
     
-    await callback.message.edit_text(f"Accepted {success_count} requests successfully.")
+    await callback.message.edit_text(
+        f"Accepted {summary['accepted'] + len(invited)} requests successfully.\n"
+        f"Failed: {summary['failed']} ({summary['dead']} given up) | FloodWaits: {summary['flood_waits']}\n"
+        f"Took {summary['elapsed']:.1f}s ({summary['throughput']:.1f} req/s)"
+    )
@@ -1,22 +1,41 @@
 from aiogram import Dispatcher, types
 from aiogram.dispatcher import F
 from aiogram.dispatcher.filters import ChatMemberUpdatedFilter, IS_NOT_MEMBER, IS_MEMBER
+from aiogram.dispatcher.handler import SkipHandler
 from database.operations import db
-from userbot.client import userbot_client
+from services.approval_queue import approval_queue
+from services.dashboard import dashboard
+from services.user_summary import user_summaries
+from services import promotion
+from services.onboarding import onboarding
 from utils.logger import Logger
+from utils.scheduler import lane, REALTIME, BULK
+from utils.metrics import approval_latency, approvals, join_requests
 from config import config
 import asyncio
+import time
+from utils.log import get_logger, new_trace, span
 
-# This will be set by main.py
-promotion_service = None
+log = get_logger("group_events")
+
+async def member_update_handler(update: types.ChatMemberUpdated):
+    """Keep the permission cache current; later handlers still run"""
+    if promotion.promotion_service:
+        promotion.promotion_service.observe_member_update(update)
+    raise SkipHandler()
 
 async def bot_added_to_chat_handler(update: types.ChatMemberUpdated):
     """Handler for when bot is added to group/channel"""
+    # Bookkeeping for a new chat must not crowd out approvals
+    with lane(BULK):
+        await setup_added_chat(update)
+
+async def setup_added_chat(update: types.ChatMemberUpdated):
     try:
         chat = update.chat
         user = update.from_user
         
-        print(f"Bot added to {chat.title} (ID: {chat.id}) by {user.id}")
+        log.info(f"Bot added to {chat.title} (ID: {chat.id}) by {user.id}")
         
         # Determine chat type
         if chat.type in ["group", "supergroup"]:
@@ -26,115 +45,78 @@ async def bot_added_to_chat_handler(update: types.ChatMemberUpdated):
         else:
             return
         
-        # Create invite link for the chat
-        invite_link = None
-        try:
-            invite = await update.bot.create_chat_invite_link(
-                chat.id, 
-                name="AutoReq UserBot Join",
-                creates_join_request=False,
-                expire_date=None,
-                member_limit=1
-            )
-            invite_link = invite.invite_link
-            print(f"Created invite link: {invite_link}")
-        except Exception as e:
-            print(f"Could not create invite link: {e}")
-        
         # Save to database
         chat_data = {
             "chat_id": str(chat.id),
             "title": chat.title,
             "chat_type": chat_type,
             "added_by": user.id,
-            "invite_link": invite_link,
+            "invite_link": None,
             "is_active": True,
             "userbot_setup": False
         }
         
-        result = db.add_chat(chat_data)
+        result = await db.add_chat(chat_data)
         
         if result:
-            print(f"Chat {chat.title} saved to database")
-            
-            # If it's a channel and userbot is connected, setup userbot
-            if chat_type == "channel" and userbot_client.is_connected and invite_link:
-                print(f"Setting up userbot for channel {chat.id}")
-                
-                # Step 1: Userbot joins channel
-                join_success = await userbot_client.setup_channel(chat.id, invite_link)
-                
-                if join_success and promotion_service:
-                    # Step 2: Bot promotes userbot to admin
-                    userbot_info = await userbot_client.get_userbot_info()
-                    if userbot_info:
-                        promote_success = await promotion_service.promote_userbot(
-                            chat.id, 
-                            userbot_info['id']
-                        )
-                        
-                        if promote_success:
-                            # Update database with setup status
-                            db.chats.update_one(
-                                {"chat_id": str(chat.id)},
-                                {"$set": {"userbot_setup": True}}
-                            )
-                            print(f"Userbot setup completed for {chat.title}")
+            log.info(f"Chat {chat.title} saved to database")
+            dashboard.invalidate()
+            user_summaries.add_chat(user.id, chat_data['chat_id'], chat_type)
+        
+        # Invite link, userbot join and promotion run in the background
+        await onboarding.start_chat(chat.id, chat_type)
         
     except Exception as e:
-        print(f"Error in bot_added_to_chat: {e}")
+        log.warning(f"Error in bot_added_to_chat: {e}")
 
 async def chat_join_request_handler(update: types.ChatJoinRequest):
     """Handler for join requests"""
+    # One trace per request ties its DB writes, approval and logging together
+    new_trace()
+    with lane(REALTIME), span("join_request", log, chat_id=update.chat.id, user_id=update.from_user.id):
+        await process_join_request(update)
+
+async def process_join_request(update: types.ChatJoinRequest):
+    received = time.monotonic()
     try:
         chat = update.chat
         user = update.from_user
+        join_requests.inc(chat_id=chat.id)
         
-        print(f"Join request from {user.id} in {chat.title}")
+        log.debug("join request", sampled=True, chat_id=chat.id, user_id=user.id)
         
-        # Save to database
+        chat_data = await db.get_chat(str(chat.id))
+        auto_accept = bool(chat_data and chat_data.get('is_active', True))
+        
+        # Save to database before approving, leased to this handler: if we
+        # die before the approval lands, the approval queue retries it
         request_data = {
             "chat_id": str(chat.id),
             "user_id": user.id,
             "username": user.username or "",
-            "first_name": user.first_name or "",
-            "status": "pending"
+            "first_name": user.first_name or ""
         }
-        db.add_request(request_data)
-        
-        # Update stats
-        stats = db.get_chat_stats(str(chat.id))
-        db.update_chat_stats(str(chat.id), {
-            "total_requests": stats["total_requests"] + 1,
-            "pending_requests": stats["pending_requests"] + 1
-        })
+        with span("approval_queue.enqueue", log):
+            queued = await approval_queue.enqueue(request_data, lease=auto_accept)
         
         # AUTO-ACCEPT USING BOT
-        chat_data = db.get_chat(str(chat.id))
-        if chat_data and chat_data.get('is_active', True):
-            
-            try:
-                # Aiogram 2.x method - approve the request
-                await update.approve()
-                
-                # Update database
-                db.update_request_status(str(chat.id), user.id, "accepted")
-                stats = db.get_chat_stats(str(chat.id))
-                db.update_chat_stats(str(chat.id), {
-                    "pending_requests": stats["pending_requests"] - 1,
-                    "accepted_requests": stats["accepted_requests"] + 1
-                })
-                
-                await Logger.log_request_accepted(chat.title, user.username or user.first_name)
-                print(f"✅ Request accepted via BOT for {user.id}")
-                
-            except Exception as e:
-                print(f"❌ Bot approval failed: {e}")
+        if auto_accept:
+            # Aiogram 2.x method; the queue keeps the lease alive while it
+            # waits, then buffers the status update (see write_buffer.flush)
+            with span("approve", log):
+                accepted = await approval_queue.approve(queued, update.approve)
+            if accepted:
+                approval_latency.observe(time.monotonic() - received)
+                approvals.inc(chat_id=chat.id)
+                await Logger.log_request_accepted(chat.id, chat.title, user.username or user.first_name)
+                log.info("request accepted", sampled=True, chat_id=chat.id, user_id=user.id)
         
     except Exception as e:
-        print(f"❌ Join request error: {e}")
+        log.exception("join request error", error=str(e))
 
 def register_handlers(dp: Dispatcher):
+    # Registered first so it sees every change of the bot's membership
+    dp.register_my_chat_member_handler(member_update_handler)
     dp.register_my_chat_member_handler(
         bot_added_to_chat_handler, 
         ChatMemberUpdatedFilter(IS_NOT_MEMBER >> IS_MEMBER)
@@ -1,21 +1,47 @@
 import asyncio
-import logging
+from aiohttp import web
 from aiogram import Bot, Dispatcher, types
+from aiogram.bot.api import TelegramAPIServer, TELEGRAM_PRODUCTION
 from aiogram.contrib.fsm_storage.memory import MemoryStorage
 from aiogram.utils import executor
 
 from config import config
 from database.operations import db
+from database.counters import counters
+from database.write_buffer import write_buffer
+from services.approval_queue import approval_queue
+from services.backlog import backlog
+from services.onboarding import onboarding
 from userbot.client import userbot_client
 from utils.logger import Logger
+from utils.rate_limiter import RateLimitedBot, bot_limiter
+from utils import webhook
+from utils.chat_executor import OrderedDispatcher
+from utils.background import jobs
+from utils import metrics
+from utils.log import get_logger, setup_logging, stop_logging
 
 # Import and initialize promotion service
 from services.promotion import init_promotion_service
 
+# Not chat_member: it fires for every member change, including each
+# approval, while the bot's own changes already come as my_chat_member
+ALLOWED_UPDATES = ["message", "callback_query", "my_chat_member", "chat_join_request"]
+
+# Structured logging before anything starts talking
+setup_logging()
+log = get_logger("main")
+
 # Initialize bot
-bot = Bot(token=config.BOT_TOKEN)
+if config.EMULATOR:
+    server = TelegramAPIServer.from_base(f"http://127.0.0.1:{config.EMULATOR_PORT}")
+elif config.BOT_API_SERVER:
+    server = TelegramAPIServer.from_base(config.BOT_API_SERVER)
+else:
+    server = TELEGRAM_PRODUCTION
+bot = RateLimitedBot(token=config.BOT_TOKEN, server=server)
 storage = MemoryStorage()
-dp = Dispatcher(bot, storage=storage)
+dp = OrderedDispatcher(bot, storage=storage)
 
 # Initialize promotion service
 promotion_service = init_promotion_service(bot)
@@ -31,6 +57,8 @@ group_events.register_handlers(dp)
 
 # Set bot for logger
 Logger.set_bot(bot)
+approval_queue.set_bot(bot)
+onboarding.set_bot(bot)
 
 @dp.message_handler(commands=['test'])
 async def test_handler(message: types.Message):
@@ -56,6 +84,8 @@ async def help_handler(message: types.Message):
 <code>/db</code> - Database management (Owner only)
 <code>/stats</code> - Bot statistics (Owner only)
 <code>/debug</code> - Debug information (Owner only)
+<code>/reconcile</code> - Recover join requests missed while offline (Owner only)
+<code>/audit</code> - Check bot and userbot permissions in all chats (Owner only)
 
 <code>/check_permissions CHANNEL_ID</code> - Check bot permissions
 <code>/manual_promote CHANNEL_ID</code> - Manually promote userbot
@@ -64,14 +94,125 @@ async def help_handler(message: types.Message):
 """
     await message.answer(help_text, parse_mode='HTML')
 
-async def on_startup(dp):
-    print("🚀 Starting Auto Request Acceptor Bot...")
-    # Start userbot
-    await userbot_client.start()
+# EMULATOR=1: the emulator's world and its HTTP runner
+emulator_state = None
+emulator_runner = None
+
+async def start_emulator():
+    """Serve the Bot API emulator in this process, before the bot calls it"""
+    global emulator_state, emulator_runner
+    from emulator.bot_api import EmulatorState, create_app
+    emulator_state = EmulatorState(
+        bot_id=bot.id, latency=config.EMULATOR_LATENCY, rate_429=config.EMULATOR_RATE_429,
+        flood_wait=config.EMULATOR_FLOOD_WAIT, flood_seconds=config.EMULATOR_FLOOD_SECONDS
+    )
+    emulator_runner = web.AppRunner(create_app(emulator_state))
+    await emulator_runner.setup()
+    await web.TCPSite(emulator_runner, "127.0.0.1", config.EMULATOR_PORT).start()
+    log.info(f"Emulator listening on 127.0.0.1:{config.EMULATOR_PORT}")
+
+def emulator_clients():
+    """Fake Telethon clients sharing the emulator's world, or None"""
+    if emulator_state is None:
+        return None
+    from emulator.telethon_fake import FakeTelegramClient
+    # User ids 2.. like the fake client's default, one per account
+    return [FakeTelegramClient(emulator_state, user_id=2 + i) for i in range(config.EMULATOR_USERBOTS)]
 
-async def on_shutdown(dp):
+async def on_startup(dp, worker=0):
+    log.info("Starting Auto Request Acceptor Bot...", worker=worker)
+    # Prepare database
+    await db.init()
+    if worker == 0:
+        counters.start_reconciler(buffer=write_buffer)
+        # Resumes approvals a previous run left unfinished
+        approval_queue.start()
+    write_buffer.start()
+    Logger.start()
+    await metrics.start_server(port=config.METRICS_PORT + worker if config.METRICS_PORT else None)
+    # Only one process may use the userbot session
+    if worker == 0:
+        # Before the userbot: chats parked meanwhile resume once it connects
+        await onboarding.start()
+        await userbot_client.start(clients=emulator_clients())
+        # Catch up on join requests that arrived while we were down
+        backlog.start()
+        # Leave half the permission cache to live traffic
+        warm_limit = min(config.PERMISSION_WARMUP_LIMIT, config.PERMISSION_CACHE_SIZE // 2)
+        asyncio.create_task(promotion_service.warm_up(await db.get_busiest_chat_ids(warm_limit)))
+
+async def on_shutdown(dp, worker=0):
+    # Let queued updates finish before their writes are flushed
+    await dp.executor.join()
+    await jobs.stop()
+    await counters.stop_reconciler()
+    await approval_queue.stop()
+    await backlog.stop()
+    await onboarding.stop()
+    # Flush buffered request writes before the connection goes away
+    await write_buffer.stop()
+    await Logger.stop()
     await bot.session.close()
+    if emulator_runner is not None:
+        await emulator_runner.cleanup()
+    db.close()
+    stop_logging()
+
+def run_worker(index, updates):
+    """Entry point of a webhook worker process"""
+    asyncio.run(serve_worker(index, updates))
+
+async def serve_worker(index, updates):
+    Bot.set_current(bot)
+    Dispatcher.set_current(dp)
+    # All workers share the bot token's global budget
+    bot_limiter.share(1 / config.WEBHOOK_WORKERS)
+    await on_startup(dp, worker=index)
+    try:
+        await webhook.consume(updates, dp)
+    finally:
+        await on_shutdown(dp, worker=index)
+
+def start_webhook():
+    server = webhook.WebhookServer(config.WEBHOOK_PATH, config.WEBHOOK_SECRET)
+    pool = None
+    if config.WEBHOOK_WORKERS > 1:
+        pool = webhook.WorkerPool(run_worker, config.WEBHOOK_WORKERS, config.WEBHOOK_QUEUE_SIZE)
+        server.dispatch = pool.dispatch
+    else:
+        server.dispatch = lambda update: webhook.process_in_background(dp, update)
+
+    async def startup(app):
+        if pool:
+            pool.start()
+        else:
+            Bot.set_current(bot)
+            Dispatcher.set_current(dp)
+            await on_startup(dp)
+        await bot.set_webhook(
+            config.WEBHOOK_URL + config.WEBHOOK_PATH,
+            secret_token=config.WEBHOOK_SECRET or None,
+            allowed_updates=ALLOWED_UPDATES
+        )
+        log.info(f"Webhook set, listening on {config.WEBHOOK_HOST}:{config.WEBHOOK_PORT}")
+
+    async def cleanup(app):
+        if pool:
+            await asyncio.get_running_loop().run_in_executor(None, pool.stop)
+            await bot.session.close()
+        else:
+            await on_shutdown(dp)
+
+    app = server.app()
+    app.on_startup.append(startup)
+    app.on_cleanup.append(cleanup)
+    web.run_app(app, host=config.WEBHOOK_HOST, port=config.WEBHOOK_PORT)
 
 if __name__ == "__main__":
-    logging.basicConfig(level=logging.INFO)
-    executor.start_polling(dp, on_startup=on_startup, on_shutdown=on_shutdown)
+    if config.BOT_MODE == "webhook" and not config.EMULATOR:
+        start_webhook()
+    else:
+        if config.EMULATOR:
+            # Up before the executor's first getMe
+            asyncio.get_event_loop().run_until_complete(start_emulator())
+        executor.start_polling(dp, on_startup=on_startup, on_shutdown=on_shutdown, allowed_updates=ALLOWED_UPDATES)
@@ -0,0 +1,119 @@
+import asyncio
+import time
+from telethon.errors import FloodWaitError
+from config import config
+from utils.scheduler import lane, BULK, INTERACTIVE
+from utils.metrics import approvals
+from utils.log import get_logger
+
+log = get_logger("approval")
+
+class ApprovalEngine:
+    """Bulk join-request approval with bounded concurrency and adaptive pacing.
+
+    Calls are spaced at `rate` per second across all workers. Every
+    successful call nudges the rate up (additive increase); a FloodWait
+    pauses every worker for exactly the reported duration and halves the
+    rate (multiplicative decrease), then the failed request is retried,
+    at most `max_flood_retries` times per user before it is given up.
+    """
+
+    def __init__(self, approve, concurrency=None, start_rate=None, max_rate=None,
+                 min_rate=0.5, progress_interval=None, max_flood_retries=None):
+        self.approve = approve
+        self.concurrency = concurrency or config.APPROVAL_CONCURRENCY
+        self.rate = start_rate or config.APPROVAL_START_RATE
+        self.max_rate = max_rate or config.APPROVAL_MAX_RATE
+        self.min_rate = min_rate
+        self.progress_interval = progress_interval or config.APPROVAL_PROGRESS_INTERVAL
+        self.max_flood_retries = max_flood_retries or config.APPROVAL_MAX_FLOOD_RETRIES
+        self._next_slot = 0.0
+        self._paused_until = 0.0
+        self._slot_lock = asyncio.Lock()
+
+    async def _wait_for_slot(self):
+        async with self._slot_lock:
+            now = time.monotonic()
+            start = max(now, self._next_slot, self._paused_until)
+            self._next_slot = start + 1 / self.rate
+        await asyncio.sleep(start - now)
+
+    def _on_success(self):
+        self.rate = min(self.max_rate, self.rate + 0.1)
+
+    def _on_flood_wait(self, seconds):
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self.rate = max(self.min_rate, self.rate / 2)
+
+    async def run(self, chat_id, user_ids, on_accepted=None, on_progress=None, on_dead=None):
+        """Approve every user in user_ids, returns a summary dict.
+
+        on_accepted(user_id) is awaited after each approval, on_dead(user_id)
+        when a user hit FloodWait too often and is given up;
+        on_progress(summary) is awaited at most every progress_interval seconds.
+        """
+        queue = asyncio.Queue()
+        for user_id in user_ids:
+            queue.put_nowait(user_id)
+
+        summary = {"total": len(user_ids), "accepted": 0, "failed": 0, "dead": 0, "flood_waits": 0}
+        flood_retries = {}
+        started = time.monotonic()
+        last_progress = started
+
+        async def report():
+            nonlocal last_progress
+            now = time.monotonic()
+            if on_progress and now - last_progress >= self.progress_interval:
+                last_progress = now
+                summary["elapsed"] = now - started
+                try:
+                    with lane(INTERACTIVE):
+                        await on_progress(dict(summary))
+                except Exception as e:
+                    log.warning(f"Progress update failed: {e}")
+
+        async def worker():
+            while True:
+                try:
+                    user_id = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+
+                await self._wait_for_slot()
+                try:
+                    approved = await self.approve(int(chat_id), user_id)
+                except FloodWaitError as e:
+                    summary["flood_waits"] += 1
+                    self._on_flood_wait(e.seconds)
+                    log.warning(f"FloodWait {e.seconds}s, rate now {self.rate:.1f}/s")
+                    flood_retries[user_id] = flood_retries.get(user_id, 0) + 1
+                    if flood_retries[user_id] <= self.max_flood_retries:
+                        queue.put_nowait(user_id)
+                        continue
+                    summary["dead"] += 1
+                    if on_dead:
+                        await on_dead(user_id)
+                    approved = False
+                except Exception as e:
+                    log.warning(f"Error accepting request: {e}")
+                    approved = False
+
+                if approved:
+                    self._on_success()
+                    approvals.inc(chat_id=chat_id)
+                    summary["accepted"] += 1
+                    if on_accepted:
+                        await on_accepted(user_id)
+                else:
+                    summary["failed"] += 1
+                await report()
+
+        workers = min(self.concurrency, len(user_ids)) or 1
+        with lane(BULK):
+            await asyncio.gather(*(worker() for _ in range(workers)))
+
+        elapsed = time.monotonic() - started
+        summary["elapsed"] = elapsed
+        summary["throughput"] = summary["accepted"] / elapsed if elapsed else 0.0
+        return summary
@@ -0,0 +1,197 @@
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from config import config
+from database.operations import db
+from database.counters import counters
+from database.write_buffer import write_buffer
+from utils.scheduler import lane, BULK
+from utils.metrics import approvals
+from utils.log import get_logger
+
+log = get_logger("approval_queue")
+
+# Bot API errors saying the join request no longer exists
+ALREADY_MEMBER = "USER_ALREADY_PARTICIPANT"
+REQUEST_MISSING = "HIDE_REQUESTER_MISSING"
+MEMBER_STATUSES = ("member", "administrator", "creator", "restricted")
+
+def _error_code(error):
+    return str(error).upper().replace(" ", "_")
+
+class ApprovalQueue:
+    """Durable approval work queue on top of the `requests` collection.
+
+    A request is stored as "processing" with a lease before it is
+    approved, so if the process dies mid-approval the lease runs out and a
+    worker here picks it up again. A failed attempt goes back to
+    "pending" with exponential backoff (next_attempt_at); after
+    max_attempts it is parked as "dead" with its last error. Requests of
+    inactive chats are stored "pending" without next_attempt_at and are
+    never claimed: they wait for a manual Accept All as before.
+
+    The lease is renewed while an approval waits on the rate limiter or
+    the API, so a slow approval is never claimed a second time.
+    """
+
+    def __init__(self, database, buffer, counter_store, lease=None, max_attempts=None,
+                 retry_base=None, retry_max=None, interval=None, concurrency=None):
+        self.db = database
+        self.buffer = buffer
+        self.counters = counter_store
+        self.lease = lease or config.APPROVAL_LEASE
+        self.max_attempts = max_attempts or config.APPROVAL_MAX_ATTEMPTS
+        self.retry_base = retry_base or config.APPROVAL_RETRY_BASE
+        self.retry_max = retry_max or config.APPROVAL_RETRY_MAX
+        self.interval = interval or config.APPROVAL_QUEUE_INTERVAL
+        self.concurrency = concurrency or config.APPROVAL_CONCURRENCY
+        self.bot = None
+        self._task = None
+
+    def set_bot(self, bot):
+        self.bot = bot
+
+    async def enqueue(self, request_data, lease=True):
+        """Persist a new request, leased to the caller if it approves right away"""
+        doc = dict(request_data)
+        if lease:
+            doc.update(
+                status="processing",
+                attempts=1,
+                lease_until=datetime.utcnow() + timedelta(seconds=self.lease)
+            )
+        else:
+            doc.update(status="pending", attempts=0)
+        await self.buffer.insert_now(doc)
+        return doc
+
+    async def complete(self, doc):
+        await self.buffer.update_status(doc["chat_id"], doc["user_id"], "accepted", from_status="processing")
+
+    async def fail(self, doc, error, retry=True):
+        """Back off and retry later, or dead-letter after max_attempts"""
+        attempts = doc.get("attempts", 1)
+        error = str(error)[:500]
+        if not retry or attempts >= self.max_attempts:
+            with self.counters.changing(doc["chat_id"]):
+                result = await self.db.dead_letter_request(doc["chat_id"], doc["user_id"], error)
+                if result.modified_count:
+                    await self.counters.request_dropped(doc["chat_id"])
+            log.warning("approval dead-lettered", chat_id=doc["chat_id"], user_id=doc["user_id"],
+                        attempts=attempts, error=error)
+            return
+        delay = min(self.retry_max, self.retry_base * 2 ** (attempts - 1))
+        await self.db.retry_request(doc["chat_id"], doc["user_id"], delay, error)
+
+    async def _is_member(self, chat_id, user_id):
+        try:
+            member = await self.bot.get_chat_member(chat_id, user_id)
+            return member.status in MEMBER_STATUSES
+        except Exception:
+            return False
+
+    @asynccontextmanager
+    async def _holding(self, doc):
+        """Keep a request's lease alive for the duration of the block"""
+        async def renew():
+            while True:
+                await asyncio.sleep(self.lease / 3)
+                try:
+                    await self.db.renew_lease(doc["chat_id"], doc["user_id"], self.lease)
+                except Exception as e:
+                    log.warning("lease renewal failed", chat_id=doc["chat_id"], user_id=doc["user_id"], error=str(e))
+
+        task = asyncio.create_task(renew())
+        try:
+            yield
+        finally:
+            task.cancel()
+
+    async def approve(self, doc, approve=None):
+        """Approve a leased request and complete, retry or dead-letter it.
+
+        `approve` is the call to make (e.g. ChatJoinRequest.approve),
+        approveChatJoinRequest by default. Returns True once accepted.
+        """
+        chat_id, user_id = int(doc["chat_id"]), doc["user_id"]
+        try:
+            async with self._holding(doc):
+                if approve is None:
+                    await self.bot.approve_chat_join_request(chat_id, user_id)
+                else:
+                    await approve()
+        except Exception as e:
+            code = _error_code(e)
+            # A previous attempt may have approved it right before a crash
+            if ALREADY_MEMBER in code or (REQUEST_MISSING in code and await self._is_member(chat_id, user_id)):
+                await self.complete(doc)
+                return True
+            log.warning("approval failed", chat_id=chat_id, user_id=user_id, error=str(e))
+            # Withdrawn or handled elsewhere: retrying cannot help
+            await self.fail(doc, e, retry=REQUEST_MISSING not in code)
+            return False
+
+        await self.complete(doc)
+        return True
+
+    async def process(self, doc):
+        """Approve one claimed request"""
+        chat = await self.db.get_chat(doc["chat_id"])
+        if not chat or not chat.get("is_active", True):
+            await self.db.retry_request(doc["chat_id"], doc["user_id"], None, "chat inactive")
+            return False
+
+        if not await self.approve(doc):
+            return False
+        approvals.inc(chat_id=int(doc["chat_id"]))
+        return True
+
+    async def _process_claimed(self, doc, gate):
+        try:
+            await self.process(doc)
+        except Exception as e:
+            log.warning("queued approval failed", chat_id=doc["chat_id"], user_id=doc["user_id"], error=str(e))
+        finally:
+            gate.release()
+
+    async def run_once(self, limit=1000):
+        """Claim and process due requests until none are left, returns how many"""
+        gate = asyncio.Semaphore(self.concurrency)
+        tasks = []
+        with lane(BULK):
+            while len(tasks) < limit:
+                await gate.acquire()
+                doc = await self.db.claim_request(self.lease)
+                if doc is None:
+                    gate.release()
+                    break
+                tasks.append(asyncio.create_task(self._process_claimed(doc, gate)))
+            await asyncio.gather(*tasks)
+        return len(tasks)
+
+    async def _loop(self):
+        # First pass right away: resume what a previous run left unfinished
+        while True:
+            try:
+                processed = await self.run_once()
+                if processed:
+                    log.info(f"Approval queue processed {processed} requests")
+            except Exception as e:
+                log.warning(f"Approval queue pass failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+# Global instance
+approval_queue = ApprovalQueue(db, write_buffer, counters)
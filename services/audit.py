@@ -0,0 +1,142 @@
+import asyncio
+from datetime import datetime
+from config import config
+from database.operations import db
+from userbot.client import userbot_client
+from services import promotion
+from utils.scheduler import lane, BULK
+from utils.log import get_logger
+
+log = get_logger("audit")
+
+ADMIN_STATUSES = ("administrator", "creator")
+MEMBER_STATUSES = ("member", "administrator", "creator", "restricted")
+
+class FleetAudit:
+    """Checks the bot's and userbot's standing in every active chat.
+
+    Each chat gets a `health` record on its document (bot admin,
+    can_invite, userbot present/admin, last checked), written in bulk as
+    results come in, so dashboards can count and list unhealthy chats
+    from Mongo alone. getChatMember calls go through the promotion
+    service with fresh=True, which also refreshes its permission cache.
+    """
+
+    def __init__(self, database, userbot, concurrency=None, write_batch=None):
+        self.db = database
+        self.userbot = userbot
+        self.concurrency = concurrency or config.AUDIT_CONCURRENCY
+        self.write_batch = write_batch or config.AUDIT_WRITE_BATCH
+        self._lock = asyncio.Lock()
+
+    def _userbot_ids(self, chat_id, assigned):
+        """Accounts recorded as admin in the chat, or the one that would serve it"""
+        if assigned:
+            return list(assigned)
+        session = self.userbot.session_for(chat_id)
+        return [session.user_id] if session and session.user_id else []
+
+    async def check_chat(self, chat_id, chat_type, userbots=None):
+        """Health record of one chat"""
+        service = promotion.promotion_service
+        health = {
+            "bot_admin": False,
+            "can_invite": False,
+            "can_promote": False,
+            "userbot_present": None,
+            "userbot_admin": None,
+            "error": None,
+            "checked": datetime.utcnow()
+        }
+        try:
+            member = await service.get_member(int(chat_id), service.bot.id, fresh=True)
+            health["bot_admin"] = member.status in ADMIN_STATUSES
+            health["can_invite"] = member.status == "creator" or bool(getattr(member, "can_invite_users", False))
+            health["can_promote"] = member.status == "creator" or bool(getattr(member, "can_promote_members", False))
+
+            # Only channels are served by the userbot; any admin account will do
+            if chat_type == "channel":
+                health["userbot_present"] = health["userbot_admin"] = False
+                userbot_error = None
+                for userbot_id in self._userbot_ids(chat_id, userbots):
+                    try:
+                        member = await service.get_member(int(chat_id), userbot_id, fresh=True)
+                    except Exception as e:
+                        userbot_error = e
+                        continue
+                    health["userbot_present"] |= member.status in MEMBER_STATUSES
+                    if member.status in ADMIN_STATUSES:
+                        health["userbot_admin"] = True
+                        break
+                if userbot_error and not health["userbot_admin"]:
+                    raise userbot_error
+        except Exception as e:
+            health["error"] = str(e)[:300]
+
+        health["healthy"] = (
+            health["error"] is None
+            and health["bot_admin"]
+            and health["can_invite"]
+            and health["userbot_admin"] is not False
+        )
+        return health
+
+    async def run(self, on_progress=None):
+        """Audit every active chat with bounded concurrency.
+
+        on_progress(summary) is awaited after each chat. Returns the
+        summary, or None if an audit is already in progress.
+        """
+        if self._lock.locked():
+            return None
+        if promotion.promotion_service is None:
+            raise RuntimeError("promotion service not initialized")
+
+        async with self._lock:
+            chat_ids = await self.db.get_active_chat_ids()
+            channels = {
+                chat["chat_id"]: chat.get("userbots") or []
+                for chat in await self.db.get_userbot_assignments()
+            }
+            summary = {"chats": len(chat_ids), "done": 0, "healthy": 0, "unhealthy": 0, "errors": 0}
+            gate = asyncio.Semaphore(self.concurrency)
+            records = {}
+
+            async def flush():
+                batch = dict(records)
+                records.clear()
+                try:
+                    await self.db.set_chat_health(batch)
+                except Exception as e:
+                    log.warning(f"Could not store {len(batch)} health records: {e}")
+
+            async def audit(chat_id):
+                async with gate:
+                    chat_type = "channel" if chat_id in channels else "group"
+                    health = await self.check_chat(chat_id, chat_type, channels.get(chat_id))
+                    records[chat_id] = health
+                    summary["healthy" if health["healthy"] else "unhealthy"] += 1
+                    if health["error"]:
+                        summary["errors"] += 1
+                    summary["done"] += 1
+                    if len(records) >= self.write_batch:
+                        await flush()
+                    if on_progress:
+                        try:
+                            await on_progress(dict(summary))
+                        except Exception:
+                            pass
+
+            with lane(BULK):
+                await asyncio.gather(*(audit(chat_id) for chat_id in chat_ids))
+            if records:
+                await flush()
+
+        log.info(
+            f"Audit finished: {summary['unhealthy']} unhealthy of {summary['done']} chats "
+            f"({summary['errors']} errors)"
+        )
+        return summary
+
+# Global instance
+audit = FleetAudit(db, userbot_client)
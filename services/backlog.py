@@ -0,0 +1,119 @@
+import asyncio
+from datetime import datetime
+from config import config
+from database.operations import db
+from database.counters import counters
+from userbot.client import userbot_client
+from utils.scheduler import lane, BULK
+from utils.log import get_logger
+
+log = get_logger("backlog")
+
+class BacklogReconciler:
+    """Recovers join requests that reached Telegram while the bot was down.
+
+    Streams each active channel's pending join requests through the
+    userbot and queues the ones without an open row in `requests` as due
+    for approval, so the approval queue (services.approval_queue) picks
+    them up; a returning user's closed row is reopened. A checkpoint on
+    the chat document (backlog_sync) records the page cursor; an
+    interrupted run resumes after the last stored page.
+    """
+
+    def __init__(self, database, counter_store, userbot, concurrency=None, page_size=None):
+        self.db = database
+        self.counters = counter_store
+        self.userbot = userbot
+        self.concurrency = concurrency or config.BACKLOG_CONCURRENCY
+        self.page_size = page_size or config.BACKLOG_PAGE_SIZE
+        self._lock = asyncio.Lock()
+        self._task = None
+
+    async def sync_chat(self, chat_id):
+        """Reconcile one channel, returns (requests seen, requests added)"""
+        chat = await self.db.get_chat(str(chat_id)) or {}
+        checkpoint = chat.get("backlog_sync") or {}
+        cursor = None
+        if checkpoint and not checkpoint.get("done", True):
+            cursor = checkpoint.get("cursor")
+        else:
+            await self.db.update_backlog_sync(chat_id, done=False, cursor=None, started=datetime.utcnow())
+
+        found = added = 0
+        async for requests, cursor in self.userbot.iter_join_requests(int(chat_id), cursor, self.page_size):
+            found += len(requests)
+            with self.counters.changing(chat_id):
+                new, reopened = await self.db.add_missing_requests(chat_id, requests)
+                if new:
+                    added += new
+                    await self.counters.request_added(chat_id, new)
+                if reopened:
+                    # Same rows back to pending: total stays, accepted gives them up
+                    added += sum(reopened.values())
+                    await self.counters.apply_deltas({chat_id: {
+                        "pending_requests": sum(reopened.values()),
+                        "accepted_requests": -reopened.get("accepted", 0)
+                    }})
+            await self.db.update_backlog_sync(chat_id, cursor=cursor)
+
+        await self.db.update_backlog_sync(
+            chat_id, done=True, cursor=None, finished=datetime.utcnow(), found=found, added=added
+        )
+        return found, added
+
+    async def run(self, chat_ids=None, on_progress=None):
+        """Reconcile every active channel (or `chat_ids`) with bounded concurrency.
+
+        on_progress(summary) is awaited after each chat. Returns the
+        summary, or None if a run is already in progress.
+        """
+        if self._lock.locked() or not self.userbot.is_connected:
+            return None
+
+        async with self._lock:
+            if chat_ids is None:
+                chat_ids = await self.db.get_active_chat_ids("channel")
+            summary = {"chats": len(chat_ids), "done": 0, "failed": 0, "found": 0, "added": 0}
+            gate = asyncio.Semaphore(self.concurrency)
+
+            async def reconcile(chat_id):
+                async with gate:
+                    try:
+                        found, added = await self.sync_chat(chat_id)
+                        summary["found"] += found
+                        summary["added"] += added
+                    except Exception as e:
+                        summary["failed"] += 1
+                        log.warning("backlog sync failed", chat_id=chat_id, error=str(e))
+                    summary["done"] += 1
+                    if on_progress:
+                        try:
+                            await on_progress(dict(summary))
+                        except Exception:
+                            pass
+
+            with lane(BULK):
+                await asyncio.gather(*(reconcile(chat_id) for chat_id in chat_ids))
+
+        log.info(
+            f"Backlog reconciled: {summary['added']} missing of {summary['found']} pending "
+            f"in {summary['done']} chats ({summary['failed']} failed)"
+        )
+        return summary
+
+    def start(self):
+        """Run once in the background, e.g. from on_startup"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+# Global instance
+backlog = BacklogReconciler(db, counters, userbot_client)
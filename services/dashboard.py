@@ -0,0 +1,63 @@
+from config import config
+from database.operations import db
+from utils.cache import TTLCache
+
+class DashboardService:
+    """Owner dashboard figures (/db, /stats, /debug) from one aggregation.
+
+    The summary is cached for a few seconds so repeated dashboard opens do
+    not rescan the chats collection.
+    """
+
+    def __init__(self, database, ttl=None):
+        self.db = database
+        self.cache = TTLCache(maxsize=1, ttl=ttl or config.DASHBOARD_CACHE_TTL)
+
+    async def _aggregate(self):
+        pipeline = [{"$facet": {
+            "by_type": [
+                {"$group": {"_id": "$chat_type", "count": {"$sum": 1}}}
+            ],
+            "active": [
+                {"$match": {"is_active": {"$ne": False}}},
+                {"$count": "count"}
+            ],
+            # From the last /audit, no live API calls
+            "unhealthy": [
+                {"$match": {"health.healthy": False}},
+                {"$count": "count"}
+            ]
+        }}]
+        result = await self.db.chats.aggregate(pipeline).to_list(length=1)
+        facets = result[0] if result else {"by_type": [], "active": [], "unhealthy": []}
+
+        by_type = {row["_id"]: row["count"] for row in facets["by_type"]}
+        return {
+            "groups": by_type.get("group", 0),
+            "channels": by_type.get("channel", 0),
+            "total": sum(by_type.values()),
+            "active": facets["active"][0]["count"] if facets["active"] else 0,
+            "unhealthy": facets["unhealthy"][0]["count"] if facets["unhealthy"] else 0
+        }
+
+    async def recent_chats(self, limit=5):
+        cursor = self.db.chats.find(
+            {},
+            {"_id": 0, "title": 1, "chat_type": 1, "is_active": 1}
+        ).sort("added_date", -1).limit(limit)
+        return await cursor.to_list(length=limit)
+
+    async def get_summary(self):
+        """{"groups", "channels", "total", "active", "unhealthy", "recent"}"""
+        summary = self.cache.get("summary")
+        if summary is None:
+            summary = await self._aggregate()
+            summary["recent"] = await self.recent_chats()
+            self.cache.set("summary", summary)
+        return summary
+
+    def invalidate(self):
+        self.cache.clear()
+
+# Global instance
+dashboard = DashboardService(db)
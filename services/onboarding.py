@@ -0,0 +1,232 @@
+import asyncio
+from datetime import datetime, timedelta
+from telethon.errors import InviteHashExpiredError, InviteHashInvalidError
+from config import config
+from database.operations import db
+from userbot.client import userbot_client
+from services import promotion
+from utils.scheduler import lane, BULK
+from utils.log import get_logger
+
+log = get_logger("onboarding")
+
+# Stages a new chat goes through, in order; then "done" (or "failed")
+STAGES = {
+    "channel": ("invite_link", "join", "promote"),
+    "group": ("invite_link",),
+}
+# Stages that need a userbot account
+USERBOT_STAGES = ("join", "promote")
+
+class OnboardingPipeline:
+    """Sets up newly added chats in the background.
+
+    The update handler only saves the chat and calls start(); a bounded
+    pool of workers then runs the stages. The current stage, attempt
+    count and last error are persisted on the chat document
+    (`onboarding`), so a restart resumes where it stopped. A failed stage
+    is retried with exponential backoff, and after max_attempts the chat
+    is marked failed with the stage and error that stopped it. While no
+    userbot account is connected, userbot stages are parked instead; when
+    the pool connects, parked chats and chats that failed at a userbot
+    stage are resumed.
+    """
+
+    def __init__(self, database, userbot, workers=None, max_attempts=None, retry_base=None, retry_max=None):
+        self.db = database
+        self.userbot = userbot
+        self.workers = workers or config.ONBOARDING_WORKERS
+        self.max_attempts = max_attempts or config.ONBOARDING_MAX_ATTEMPTS
+        self.retry_base = retry_base or config.ONBOARDING_RETRY_BASE
+        self.retry_max = retry_max or config.ONBOARDING_RETRY_MAX
+        self.bot = None
+        self.queue = asyncio.Queue()
+        self.scheduled = set()
+        # Chats a worker is advancing, and ones to run again after it
+        self.running = set()
+        self.rerun = set()
+        # Chats parked since the last resume, for ones whose write is in flight
+        self.parked = set()
+        self._tasks = []
+        userbot.connect_listeners.append(self.resume_parked)
+
+    def set_bot(self, bot):
+        self.bot = bot
+
+    async def start_chat(self, chat_id, chat_type):
+        """(Re)start onboarding of a chat from its first stage"""
+        first = STAGES.get(chat_type, ())
+        await self.db.set_onboarding(
+            chat_id,
+            stage=first[0] if first else "done",
+            attempts=0,
+            last_error=None,
+            started=datetime.utcnow()
+        )
+        if first:
+            self.schedule(chat_id)
+
+    def schedule(self, chat_id, delay=0):
+        chat_id = str(chat_id)
+        if chat_id in self.scheduled:
+            return
+        self.scheduled.add(chat_id)
+        if delay > 0:
+            asyncio.get_running_loop().call_later(delay, self.queue.put_nowait, chat_id)
+        else:
+            self.queue.put_nowait(chat_id)
+
+    # --- stages -------------------------------------------------------------
+
+    async def _invite_link(self, chat):
+        if chat.get("invite_link"):
+            return True
+        invite = await self.bot.create_chat_invite_link(
+            int(chat["chat_id"]),
+            name="AutoReq UserBot Join",
+            creates_join_request=False,
+            expire_date=None,
+            member_limit=1
+        )
+        chat["invite_link"] = invite.invite_link
+        await self.db.set_invite_link(chat["chat_id"], invite.invite_link)
+        return True
+
+    async def _join(self, chat):
+        if not self.userbot.is_connected:
+            raise RuntimeError("userbot not connected")
+        # Back through the invite_link stage if the last attempt cleared it
+        await self._invite_link(chat)
+        try:
+            # Joins, then polls until the channel is accessible
+            return await self.userbot.setup_channel(int(chat["chat_id"]), chat["invite_link"])
+        except (InviteHashExpiredError, InviteHashInvalidError):
+            # Links are single use (member_limit=1), e.g. consumed by
+            # another session before a flood made the pool switch; the
+            # retry makes a new one, its attempts still count for join
+            chat["invite_link"] = None
+            await self.db.set_invite_link(chat["chat_id"], None)
+            raise
+
+    async def _promote(self, chat):
+        service = promotion.promotion_service
+        if service is None:
+            raise RuntimeError("promotion service not initialized")
+        chat_id = int(chat["chat_id"])
+        userbot_info = await self.userbot.get_userbot_info(chat_id)
+        if not userbot_info:
+            return False
+        if not await service.promote_userbot(chat_id, userbot_info['id']):
+            return False
+        await self.userbot.mark_admin(chat_id, userbot_info['id'])
+        return True
+
+    # --- driver ---------------------------------------------------------------
+
+    async def advance(self, chat_id):
+        """Run a chat's remaining stages until done or one needs a retry"""
+        chat = await self.db.get_chat(chat_id)
+        if not chat or not chat.get("onboarding"):
+            return
+        stages = STAGES.get(chat.get("chat_type"), ())
+        state = chat["onboarding"]
+        stage = state.get("stage")
+        attempts = state.get("attempts", 0)
+
+        while stage in stages:
+            if stage in USERBOT_STAGES and not self.userbot.is_connected:
+                reason = "userbot not connected" if self.userbot.sessions else "no userbot configured"
+                # Before any await: a resume_parked() from now on sees it
+                self.parked.add(chat_id)
+                await self.db.set_onboarding(chat_id, stage=stage, parked=True, last_error=reason)
+                log.info(f"Onboarding of {chat_id} parked at {stage}: {reason}")
+                return
+            if state.get("parked"):
+                state["parked"] = False
+                await self.db.set_onboarding(chat_id, parked=False)
+
+            try:
+                done = await getattr(self, f"_{stage}")(chat)
+                error = None if done else f"{stage} did not complete"
+            except Exception as e:
+                done, error = False, str(e)
+
+            if not done:
+                attempts += 1
+                if attempts >= self.max_attempts:
+                    await self.db.set_onboarding(chat_id, stage="failed", failed_stage=stage,
+                                                 attempts=attempts, last_error=error)
+                    # Do not keep routing the chat to a session never promoted
+                    self.userbot.forget_joining(chat_id)
+                    log.warning("onboarding failed", chat_id=chat_id, stage=stage, error=error)
+                    return
+                delay = min(self.retry_max, self.retry_base * 2 ** (attempts - 1))
+                await self.db.set_onboarding(chat_id, attempts=attempts, last_error=error,
+                                             next_attempt_at=datetime.utcnow() + timedelta(seconds=delay))
+                self.schedule(chat_id, delay)
+                return
+
+            index = stages.index(stage) + 1
+            stage = stages[index] if index < len(stages) else "done"
+            attempts = 0
+            await self.db.set_onboarding(chat_id, stage=stage, attempts=0, last_error=None)
+
+        log.info(f"Onboarding finished for {chat.get('title')} ({chat_id})")
+
+    async def _worker(self):
+        while True:
+            chat_id = await self.queue.get()
+            self.scheduled.discard(chat_id)
+            if chat_id in self.running:
+                # Another worker has it; run again once that one is done
+                self.rerun.add(chat_id)
+                continue
+            self.running.add(chat_id)
+            try:
+                with lane(BULK):
+                    await self.advance(chat_id)
+            except Exception as e:
+                log.warning("onboarding step crashed", chat_id=chat_id, error=str(e))
+            finally:
+                self.running.discard(chat_id)
+                if chat_id in self.rerun:
+                    self.rerun.discard(chat_id)
+                    self.schedule(chat_id)
+
+    async def start(self):
+        """Start the workers and pick up chats a previous run left unfinished"""
+        if self._tasks:
+            return
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        now = datetime.utcnow()
+        resumed = await self.db.get_unfinished_onboarding()
+        for chat in resumed:
+            due = chat["onboarding"].get("next_attempt_at")
+            self.schedule(chat["chat_id"], (due - now).total_seconds() if due else 0)
+        if resumed:
+            log.info(f"Resuming onboarding of {len(resumed)} chats")
+
+    async def resume_parked(self):
+        """Reschedule chats that were waiting for a userbot (connect listener)"""
+        chat_ids = set(self.parked)
+        self.parked.clear()
+        for chat in await self.db.get_parked_onboarding(USERBOT_STAGES):
+            state = chat["onboarding"]
+            if state.get("stage") == "failed":
+                # Give the userbot stage a fresh set of attempts
+                await self.db.set_onboarding(chat["chat_id"], stage=state["failed_stage"], failed_stage=None,
+                                             attempts=0, last_error=None)
+            chat_ids.add(chat["chat_id"])
+        for chat_id in chat_ids:
+            self.schedule(chat_id)
+        if chat_ids:
+            log.info(f"Userbot connected, resuming onboarding of {len(chat_ids)} chats")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+# Global instance
+onboarding = OnboardingPipeline(db, userbot_client)
@@ -3,36 +3,88 @@ from aiogram.types import ChatAdministratorRights
 from aiogram.types import ChatMemberStatus
 from config import config
 import asyncio
+from utils.cache import TTLCache
+from utils.scheduler import lane, BULK
+from utils.log import get_logger
+
+log = get_logger("promotion")
 
 class PromotionService:
     def __init__(self, bot_client: Bot):
         self.bot = bot_client
-        print("✅ Promotion service initialized with Aiogram 2.x")
+        # (chat_id, user_id) -> ChatMember; kept current by member updates
+        self.members = TTLCache(maxsize=config.PERMISSION_CACHE_SIZE, ttl=config.PERMISSION_CACHE_TTL)
+        log.info("Promotion service initialized with Aiogram 2.x")
+    
+    async def get_member(self, chat_id: int, user_id: int, fresh: bool = False):
+        """ChatMember from the cache, or from getChatMember on a miss"""
+        key = (int(chat_id), int(user_id))
+        member = None if fresh else self.members.get(key)
+        if member is None:
+            member = await self.bot.get_chat_member(chat_id, user_id)
+            self.members.set(key, member)
+        return member
+    
+    def observe_member_update(self, update):
+        """Apply a my_chat_member update to the cache"""
+        key = (update.chat.id, update.new_chat_member.user.id)
+        if key[1] == self.bot.id or key in self.members:
+            self.members.set(key, update.new_chat_member)
+    
+    def forget_member(self, chat_id: int, user_id: int):
+        self.members.pop((int(chat_id), int(user_id)))
+    
+    async def warm_up(self, chat_ids, concurrency=None):
+        """Load the bot's own membership in many chats, returns how many.
+
+        Stops starting loads after half the cache TTL, so the first
+        entries are still fresh when the warm-up ends.
+        """
+        gate = asyncio.Semaphore(concurrency or config.PERMISSION_WARMUP_CONCURRENCY)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + config.PERMISSION_CACHE_TTL / 2
+        warmed = 0
+        
+        async def load(chat_id):
+            nonlocal warmed
+            async with gate:
+                if loop.time() > deadline:
+                    return
+                try:
+                    await self.get_member(chat_id, self.bot.id)
+                    warmed += 1
+                except Exception as e:
+                    log.warning(f"Could not load bot permissions in {chat_id}: {e}")
+        
+        with lane(BULK):
+            await asyncio.gather(*(load(chat_id) for chat_id in chat_ids))
+        log.info(f"Permission cache warmed for {warmed}/{len(chat_ids)} chats")
+        return warmed
     
     async def promote_userbot(self, chat_id: int, userbot_user_id: int):
         """Promote userbot to admin using bot's admin privileges"""
         try:
-            print(f"Promoting userbot {userbot_user_id} in chat {chat_id}")
+            log.info(f"Promoting userbot {userbot_user_id} in chat {chat_id}")
             
             # Check if bot has admin rights
-            bot_member = await self.bot.get_chat_member(chat_id, self.bot.id)
+            bot_member = await self.get_member(chat_id, self.bot.id)
             if bot_member.status != ChatMemberStatus.ADMINISTRATOR:
-                print("Bot is not admin in this chat")
+                log.warning("Bot is not admin in this chat")
                 return False
             
             # Check if bot has promote permission
             if not bot_member.can_promote_members:
-                print("Bot does not have promote members permission")
+                log.warning("Bot does not have promote members permission")
                 return False
             
             # Check if userbot is already admin
             try:
-                userbot_member = await self.bot.get_chat_member(chat_id, userbot_user_id)
+                userbot_member = await self.get_member(chat_id, userbot_user_id)
                 if userbot_member.status == ChatMemberStatus.ADMINISTRATOR:
-                    print("Userbot is already an admin")
+                    log.info("Userbot is already an admin")
                     return True
             except Exception as e:
-                print(f"Error checking userbot status: {e}")
+                log.warning(f"Error checking userbot status: {e}")
             
             # For Aiogram 2.x, we use individual parameters
             await self.bot.promote_chat_member(
@@ -59,19 +111,22 @@ class PromotionService:
                     custom_title="AutoReq UserBot"
                 )
             except Exception as e:
-                print(f"Could not set custom title: {e}")
+                log.warning(f"Could not set custom title: {e}")
             
-            print(f"Successfully promoted userbot in {chat_id}")
+            self.forget_member(chat_id, userbot_user_id)
+            log.info(f"Successfully promoted userbot in {chat_id}")
             return True
             
         except Exception as e:
-            print(f"Error promoting userbot: {e}")
+            # Maybe our cached rights were stale; look again next time
+            self.forget_member(chat_id, self.bot.id)
+            log.warning(f"Error promoting userbot: {e}")
             return False
     
     async def check_bot_permissions(self, chat_id: int):
         """Check if bot has required admin permissions"""
         try:
-            bot_member = await self.bot.get_chat_member(chat_id, self.bot.id)
+            bot_member = await self.get_member(chat_id, self.bot.id)
             
             if bot_member.status != ChatMemberStatus.ADMINISTRATOR:
                 return False, "Bot is not admin in this chat"
@@ -97,7 +152,7 @@ class PromotionService:
     async def get_bot_permissions_in_channel(self, chat_id: int):
         """Get detailed bot permissions in a specific channel"""
         try:
-            bot_member = await self.bot.get_chat_member(chat_id, self.bot.id)
+            bot_member = await self.get_member(chat_id, self.bot.id)
             
             permissions_info = f"Bot status: {bot_member.status}\n"
             
@@ -123,5 +178,5 @@ promotion_service = None
 def init_promotion_service(bot_client: Bot):
     global promotion_service
     promotion_service = PromotionService(bot_client)
-    print(f"✅ Promotion service initialized with bot ID: {bot_client.id}")
+    log.info(f"Promotion service initialized with bot ID: {bot_client.id}")
     return promotion_service
@@ -0,0 +1,44 @@
+from config import config
+from database.operations import db
+from utils.cache import TTLCache
+
+class UserChatSummaryStore:
+    """Per-user group/channel id lists for /manage and the my_* menus.
+
+    Loaded from Mongo once per user and then kept current in memory by the
+    add/remove hooks; entries expire after a TTL so drift cannot live long.
+    """
+
+    def __init__(self, database, ttl=None, maxsize=None):
+        self.db = database
+        self.cache = TTLCache(
+            maxsize=maxsize or config.USER_SUMMARY_CACHE_SIZE,
+            ttl=ttl or config.USER_SUMMARY_CACHE_TTL
+        )
+
+    async def get(self, user_id):
+        """{"groups": [chat_id, ...], "channels": [chat_id, ...]}"""
+        summary = self.cache.get(user_id)
+        if summary is None:
+            summary = {"groups": [], "channels": []}
+            cursor = self.db.chats.find(
+                {"added_by": user_id},
+                {"_id": 0, "chat_id": 1, "chat_type": 1}
+            )
+            async for chat in cursor:
+                summary[f"{chat['chat_type']}s"].append(chat['chat_id'])
+            self.cache.set(user_id, summary)
+        return summary
+
+    def add_chat(self, user_id, chat_id, chat_type):
+        summary = self.cache.get(user_id)
+        if summary is not None and chat_id not in summary[f"{chat_type}s"]:
+            summary[f"{chat_type}s"].append(chat_id)
+
+    def remove_chat(self, user_id, chat_id, chat_type):
+        summary = self.cache.get(user_id)
+        if summary is not None and chat_id in summary[f"{chat_type}s"]:
+            summary[f"{chat_type}s"].remove(chat_id)
+
+# Global instance
+user_summaries = UserChatSummaryStore(db)
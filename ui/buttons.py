@@ -27,13 +27,11 @@ class ButtonManager:
         ])
 
     @staticmethod
-    def chat_list(chats, page=0, list_type="db_groups"):
+    def chat_list(chats, list_type="db_groups", has_prev=False, has_next=False):
+        """One page of chats; nav buttons carry the keyset cursor (_id)"""
         buttons = []
-        chats_per_page = 8
-        start_idx = page * chats_per_page
-        end_idx = start_idx + chats_per_page
         
-        for chat in chats[start_idx:end_idx]:
+        for chat in chats:
             status = "✅" if chat.get('is_active', True) else "❌"
             buttons.append([
                 InlineKeyboardButton(
@@ -43,10 +41,10 @@ class ButtonManager:
             ])
         
         nav_buttons = []
-        if page > 0:
-            nav_buttons.append(InlineKeyboardButton(text="⬅️ Previous", callback_data=f"list_{list_type}_{page-1}"))
-        if end_idx < len(chats):
-            nav_buttons.append(InlineKeyboardButton(text="Next ➡️", callback_data=f"list_{list_type}_{page+1}"))
+        if has_prev and chats:
+            nav_buttons.append(InlineKeyboardButton(text="⬅️ Previous", callback_data=f"list_{list_type}_p_{chats[0]['_id']}"))
+        if has_next and chats:
+            nav_buttons.append(InlineKeyboardButton(text="Next ➡️", callback_data=f"list_{list_type}_n_{chats[-1]['_id']}"))
         
         if nav_buttons:
             buttons.append(nav_buttons)
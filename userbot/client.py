@@ -1,38 +1,141 @@
 from telethon import TelegramClient
+from telethon import utils as telethon_utils
 from telethon.sessions import StringSession
 from telethon.tl.functions.channels import InviteToChannelRequest, EditAdminRequest, GetParticipantsRequest, JoinChannelRequest, GetFullChannelRequest
-from telethon.tl.functions.messages import ImportChatInviteRequest, CheckChatInviteRequest, GetFullChatRequest, HideChatJoinRequestRequest
-from telethon.tl.types import ChatAdminRights, InputPeerChannel, ChannelParticipantsRecent
+from telethon.tl.functions.messages import ImportChatInviteRequest, CheckChatInviteRequest, GetFullChatRequest, HideChatJoinRequestRequest, HideAllChatJoinRequestsRequest, GetChatInviteImportersRequest
+from telethon.tl.types import ChatAdminRights, InputPeerChannel, ChannelParticipantsRecent, InputUser, InputUserEmpty
 from telethon.errors import ChannelPrivateError, UserAlreadyParticipantError, FloodWaitError, InviteHashExpiredError, InviteHashInvalidError
 from telethon.tl.types import PeerChannel, InputChannel, Channel, ChatInvite, ChatInviteAlready
 import asyncio
+import bisect
+import hashlib
 from config import config
+from database.operations import db
+from utils.cache import TTLCache
+from utils.rate_limiter import RateLimiter, METHOD_RATES, userbot_limiter
+from utils.metrics import telegram_call_seconds, telegram_errors
+import time
+from utils.log import get_logger
+
+log = get_logger("userbot")
+
+class RateLimitedTelegramClient(TelegramClient):
+    """TelegramClient whose every request goes through the userbot RateLimiter.
+
+    flood_sleep_threshold is 0 so FloodWaits are never slept off silently:
+    the limiter learns the wait, then the error reaches the caller.
+    """
+
+    def __init__(self, *args, limiter=None, **kwargs):
+        kwargs.setdefault("flood_sleep_threshold", 0)
+        super().__init__(*args, **kwargs)
+        self.limiter = limiter or userbot_limiter
+        # Called with the wait in seconds, lets the pool route around us
+        self.on_flood = None
+
+    @staticmethod
+    def _chat_of(request):
+        peer = getattr(request, "peer", None) or getattr(request, "channel", None)
+        if peer is None:
+            return None
+        try:
+            return telethon_utils.get_peer_id(peer)
+        except Exception:
+            return None
+
+    async def __call__(self, request, ordered=False, flood_sleep_threshold=None):
+        method = type(request).__name__
+        chat_id = self._chat_of(request)
+        await self.limiter.acquire(method, chat_id)
+        started = time.monotonic()
+        try:
+            return await super().__call__(request, ordered=ordered, flood_sleep_threshold=flood_sleep_threshold)
+        except Exception as e:
+            telegram_errors.inc(transport="userbot", method=method, error=type(e).__name__)
+            if isinstance(e, FloodWaitError):
+                self.limiter.backoff(method, chat_id, e.seconds)
+                if self.on_flood:
+                    self.on_flood(e.seconds)
+            raise
+        finally:
+            telegram_call_seconds.observe(time.monotonic() - started, transport="userbot", method=method)
 
 class UserBotClient:
-    def __init__(self):
+    """One Telethon userbot account"""
+
+    def __init__(self, session_string=None, name="userbot", limiter=None):
+        self.session_string = config.SESSION_STRING if session_string is None else session_string
+        self.name = name
+        self.limiter = limiter or userbot_limiter
         self.client = None
         self.is_connected = False
+        self.user_id = None
+        self.flood_until = 0.0
+        # chat_id -> InputPeerChannel, saves a resolve round-trip per call
+        self.entities = TTLCache(maxsize=config.ENTITY_CACHE_SIZE, ttl=config.ENTITY_CACHE_TTL)
     
-    async def start(self):
-        if not config.SESSION_STRING:
-            print("❌ No userbot session configured")
+    async def start(self, client=None, warm=True):
+        """Start from the session string, or with a ready client (e.g. the emulator's)"""
+        if client is None and not self.session_string:
+            log.warning("No userbot session configured")
             return False
         
+        if client is not None:
+            # Ready clients pace themselves with this session's own limiter
+            client.limiter = self.limiter
+        
         try:
-            self.client = TelegramClient(
-                session=StringSession(config.SESSION_STRING),
+            self.client = client or RateLimitedTelegramClient(
+                session=StringSession(self.session_string),
                 api_id=config.API_ID,
-                api_hash=config.API_HASH
+                api_hash=config.API_HASH,
+                limiter=self.limiter
             )
             
             await self.client.start()
+            self.client.on_flood = self.flood_for
+            self.user_id = (await self.client.get_me()).id
             self.is_connected = True
-            print("✅ Userbot started successfully")
+            log.info("Userbot started successfully", session=self.name, user_id=self.user_id)
+            if warm:
+                asyncio.create_task(self.warm_entity_cache())
             return True
         except Exception as e:
-            print(f"❌ Userbot failed to start: {e}")
+            log.warning(f"Userbot {self.name} failed to start: {e}")
             return False
 
+    def flood_for(self, seconds):
+        self.flood_until = max(self.flood_until, time.monotonic() + seconds)
+
+    def flooded(self):
+        return time.monotonic() < self.flood_until
+
+    async def resolve_entity(self, chat_id: int):
+        """Input peer for a chat, from the cache when possible"""
+        chat_id = int(chat_id)
+        entity = self.entities.get(chat_id)
+        if entity is None:
+            entity = await self.client.get_input_entity(chat_id)
+            self.entities.set(chat_id, entity)
+        return entity
+
+    def forget_entity(self, chat_id: int):
+        """Drop a cached entity, e.g. after losing access to the channel"""
+        self.entities.pop(int(chat_id))
+
+    async def warm_entity_cache(self, chat_ids=None):
+        """Resolve every active channel up front so approvals never have to"""
+        warmed = 0
+        if chat_ids is None:
+            chat_ids = await db.get_active_chat_ids("channel")
+        for chat_id in chat_ids:
+            try:
+                await self.resolve_entity(chat_id)
+                warmed += 1
+            except Exception as e:
+                log.warning(f"Could not resolve channel {chat_id}: {e}")
+        log.info(f"Entity cache warmed with {warmed} channels")
+
     async def get_userbot_info(self):
         """Get userbot information"""
         if not self.is_connected:
@@ -47,16 +150,20 @@ class UserBotClient:
                 'phone': me.phone
             }
         except Exception as e:
-            print(f"❌ Error getting userbot info: {e}")
+            log.warning(f"Error getting userbot info: {e}")
             return None
 
     async def join_channel_via_invite(self, invite_link: str):
-        """Join channel using invite link"""
+        """Join channel using invite link.
+
+        Raises InviteHashExpiredError / InviteHashInvalidError so the
+        caller can replace a used or expired link.
+        """
         if not self.is_connected:
             return False
         
         try:
-            print(f"Using invite link: {invite_link}")
+            log.info(f"Using invite link: {invite_link}")
             
             # For t.me/+ links (private invite links)
             if "t.me/+" in invite_link:
@@ -66,22 +173,22 @@ class UserBotClient:
                 
                 # Import the invite
                 await self.client(ImportChatInviteRequest(hash))
-                print("Userbot joined via private invite")
+                log.info("Userbot joined via private invite")
                 return True
             else:
                 # For other links, use join_chat method
                 await self.client.join_chat(invite_link)
-                print("Userbot joined via invite link")
+                log.info("Userbot joined via invite link")
                 return True
                 
         except UserAlreadyParticipantError:
-            print("Userbot already in channel")
+            log.info("Userbot already in channel")
             return True
         except (InviteHashExpiredError, InviteHashInvalidError):
-            print("Invite link expired or invalid")
-            return False
+            log.warning("Invite link expired or invalid")
+            raise
         except Exception as e:
-            print(f"Failed to join via invite: {e}")
+            log.warning(f"Failed to join via invite: {e}")
             return False
 
     async def join_channel(self, chat_id: int, invite_link: str = None):
@@ -89,17 +196,17 @@ class UserBotClient:
         if not self.is_connected:
             return False
         
-        print(f"Joining channel {chat_id}")
+        log.info(f"Joining channel {chat_id}")
         
         # Method 1: Try using invite link
         if invite_link:
-            print("Using invite link...")
+            log.info("Using invite link...")
             success = await self.join_channel_via_invite(invite_link)
             if success:
-                print("Join successful via invite link")
+                log.info("Join successful via invite link")
                 return True
         
-        print("No invite link or join failed")
+        log.warning("No invite link or join failed")
         return False
 
     async def test_channel_access(self, chat_id: int):
@@ -109,14 +216,31 @@ class UserBotClient:
         
         try:
             # Try to get entity
-            entity = await self.client.get_entity(chat_id)
-            print(f"Userbot has access to channel {chat_id}")
+            await self.resolve_entity(chat_id)
+            log.info(f"Userbot has access to channel {chat_id}")
             return True
             
+        except ChannelPrivateError as e:
+            self.forget_entity(chat_id)
+            log.warning(f"Userbot lost access to channel {chat_id}: {e}")
+            return False
         except Exception as e:
-            print(f"Userbot cannot access channel {chat_id}: {e}")
+            log.warning(f"Userbot cannot access channel {chat_id}: {e}")
             return False
 
+    async def wait_until_accessible(self, chat_id: int, timeout: float = None):
+        """Poll for channel access with growing intervals instead of a fixed sleep"""
+        timeout = config.USERBOT_READY_TIMEOUT if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        delay = 0.25
+        while True:
+            if await self.test_channel_access(chat_id):
+                return True
+            if time.monotonic() + delay > deadline:
+                return False
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 4)
+
     async def accept_join_request(self, chat_id: int, user_id: int):
         """Accept join request using multiple methods"""
         if not self.is_connected:
@@ -124,7 +248,7 @@ class UserBotClient:
         
         try:
             # Get chat entity
-            chat_entity = await self.client.get_entity(chat_id)
+            chat_entity = await self.resolve_entity(chat_id)
             
             # Method 1: Try using the user ID directly
             try:
@@ -133,10 +257,13 @@ class UserBotClient:
                     user_id=user_id,
                     approved=True
                 ))
-                print(f"Join request approved for {user_id} in {chat_id}")
+                log.debug("join request approved", sampled=True, chat_id=chat_id, user_id=user_id)
                 return True
+            except (FloodWaitError, ChannelPrivateError):
+                # Callers pace themselves from the reported wait
+                raise
             except Exception as e:
-                print(f"Method 1 failed: {e}")
+                log.warning(f"Method 1 failed: {e}")
                 
                 # Method 2: Try using InviteToChannel with user ID
                 try:
@@ -144,46 +271,187 @@ class UserBotClient:
                         channel=chat_entity,
                         users=[user_id]
                     ))
-                    print(f"User {user_id} added to channel {chat_id} (method 2)")
+                    log.info(f"User {user_id} added to channel {chat_id} (method 2)")
                     return True
+                except FloodWaitError:
+                    raise
                 except Exception as e2:
-                    print(f"Method 2 failed: {e2}")
+                    log.warning(f"Method 2 failed: {e2}")
                     return False
                 
+        except FloodWaitError:
+            raise
+        except ChannelPrivateError as e:
+            self.forget_entity(chat_id)
+            log.warning(f"Error accepting join request: {e}")
+            return False
         except Exception as e:
-            print(f"Error accepting join request: {e}")
+            log.warning(f"Error accepting join request: {e}")
+            return False
+
+    async def accept_all_join_requests(self, chat_id: int, link: str = None, wait_out_floods: bool = True):
+        """Approve a chat's whole join-request backlog in one call,
+        optionally only the requests that came through `link`"""
+        if not self.is_connected:
             return False
+        
+        flood_waits = 0
+        while True:
+            try:
+                chat_entity = await self.resolve_entity(chat_id)
+                await self.client(HideAllChatJoinRequestsRequest(
+                    peer=chat_entity,
+                    approved=True,
+                    link=link
+                ))
+                log.info(f"All join requests approved in {chat_id}")
+                return True
+            except FloodWaitError as e:
+                # Still far cheaper than N single approvals, so wait it out
+                log.warning(f"FloodWait {e.seconds}s on bulk approval in {chat_id}")
+                flood_waits += 1
+                if not wait_out_floods or flood_waits > config.USERBOT_MAX_FLOOD_WAITS:
+                    return False
+                await asyncio.sleep(e.seconds)
+            except ChannelPrivateError as e:
+                self.forget_entity(chat_id)
+                log.warning(f"Bulk approval failed in {chat_id}: {e}")
+                return False
+            except Exception as e:
+                log.warning(f"Bulk approval failed in {chat_id}: {e}")
+                return False
+
+    async def invite_users(self, chat_id: int, user_ids, batch_size: int = None, wait_out_floods: bool = True):
+        """Add users to a channel in batches, returns the ids that were invited"""
+        if not self.is_connected:
+            return []
+        
+        batch_size = batch_size or config.INVITE_BATCH_SIZE
+        invited = []
+        try:
+            chat_entity = await self.resolve_entity(chat_id)
+        except Exception as e:
+            if isinstance(e, ChannelPrivateError):
+                self.forget_entity(chat_id)
+            log.warning(f"Error resolving channel {chat_id}: {e}")
+            return invited
+        
+        flood_waits = 0
+        for i in range(0, len(user_ids), batch_size):
+            batch = user_ids[i:i + batch_size]
+            while True:
+                try:
+                    result = await self.client(InviteToChannelRequest(
+                        channel=chat_entity,
+                        users=batch
+                    ))
+                    invited.extend(self._invited_users(result, batch))
+                    break
+                except FloodWaitError as e:
+                    log.warning(f"FloodWait {e.seconds}s while inviting to {chat_id}")
+                    flood_waits += 1
+                    if not wait_out_floods or flood_waits > config.USERBOT_MAX_FLOOD_WAITS:
+                        return invited
+                    await asyncio.sleep(e.seconds)
+                except Exception as e:
+                    log.warning(f"Invite batch failed in {chat_id}: {e}")
+                    break
+        
+        log.info(f"Invited {len(invited)}/{len(user_ids)} users to {chat_id}")
+        return invited
+
+    @staticmethod
+    def _invited_users(result, batch):
+        """Users of a batch Telegram actually added: it silently skips
+        users whose privacy settings or limits forbid it"""
+        # Newer layers wrap the updates in InvitedUsers with missing_invitees
+        updates = getattr(result, "updates", result)
+        missing = {invitee.user_id for invitee in getattr(result, "missing_invitees", None) or []}
+        returned = {user.id for user in getattr(updates, "users", None) or []}
+        return [user_id for user_id in batch if user_id in returned and user_id not in missing]
+
+    async def iter_join_requests(self, chat_id: int, cursor: dict = None, page_size: int = 100):
+        """Stream a channel's pending join requests page by page.
+
+        Yields (requests, cursor); passing that cursor back resumes right
+        after the page, so callers can checkpoint it.
+        """
+        if not self.is_connected:
+            return
+        
+        chat_entity = await self.resolve_entity(chat_id)
+        cursor = cursor or {}
+        flood_waits = 0
+        while True:
+            offset_user = InputUserEmpty()
+            if cursor.get("user_id"):
+                offset_user = InputUser(cursor["user_id"], cursor.get("access_hash", 0))
+            try:
+                result = await self.client(GetChatInviteImportersRequest(
+                    peer=chat_entity,
+                    offset_date=cursor.get("date"),
+                    offset_user=offset_user,
+                    limit=page_size,
+                    requested=True
+                ))
+            except FloodWaitError as e:
+                log.warning(f"FloodWait {e.seconds}s while listing join requests in {chat_id}")
+                flood_waits += 1
+                if flood_waits > config.USERBOT_MAX_FLOOD_WAITS:
+                    # The caller's checkpoint resumes from this page next run
+                    raise
+                await asyncio.sleep(e.seconds)
+                continue
+            
+            if not result.importers:
+                return
+            users = {user.id: user for user in result.users}
+            requests = [{
+                "user_id": importer.user_id,
+                "username": getattr(users.get(importer.user_id), "username", None) or "",
+                "first_name": getattr(users.get(importer.user_id), "first_name", None) or "",
+                "date": importer.date
+            } for importer in result.importers]
+            
+            last = result.importers[-1]
+            cursor = {
+                "date": last.date,
+                "user_id": last.user_id,
+                "access_hash": getattr(users.get(last.user_id), "access_hash", 0)
+            }
+            yield requests, cursor
+            if len(result.importers) < page_size:
+                return
 
     async def setup_channel(self, chat_id: int, invite_link: str = None):
         """Join channel only - promotion will be done by bot"""
-        print(f"Setting up userbot in channel {chat_id}")
+        log.info(f"Setting up userbot in channel {chat_id}")
         
         # Step 1: Join channel
-        print("Step 1: Joining channel...")
+        log.info("Step 1: Joining channel...")
         joined = await self.join_channel(chat_id, invite_link)
         if not joined:
-            print(f"Failed to join channel {chat_id}")
+            log.warning(f"Failed to join channel {chat_id}")
             return False
         
-        # Wait a bit
-        await asyncio.sleep(3)
-        
-        # Step 2: Test access
-        print("Step 2: Testing access...")
-        has_access = await self.test_channel_access(chat_id)
+        # Step 2: Wait until the join is visible to us
+        log.info("Step 2: Testing access...")
+        has_access = await self.wait_until_accessible(chat_id)
         if not has_access:
-            print(f"Userbot cannot access channel {chat_id}")
+            log.warning(f"Userbot cannot access channel {chat_id}")
             return False
         
-        print(f"Userbot setup completed for channel {chat_id}")
+        log.info(f"Userbot setup completed for channel {chat_id}")
         return True
 
     async def get_channel_info(self, chat_id: int):
         """Get information about a channel"""
         try:
+            # Full entity needed for title/counts; resolving it proves access
             entity = await self.client.get_entity(chat_id)
             if entity:
-                has_access = await self.test_channel_access(chat_id)
+                has_access = True
+                self.entities.set(int(chat_id), await self.client.get_input_entity(entity))
                 
                 return {
                     'title': getattr(entity, 'title', 'Unknown'),
@@ -194,8 +462,245 @@ class UserBotClient:
                 }
             return None
         except Exception as e:
-            print(f"Error getting channel info: {e}")
+            if isinstance(e, ChannelPrivateError):
+                self.forget_entity(chat_id)
+            log.warning(f"Error getting channel info: {e}")
             return None
 
+def _ring_hash(key):
+    return int(hashlib.md5(key.encode()).hexdigest()[:16], 16)
+
+class UserBotPool:
+    """Several userbot accounts behind the UserBotClient interface.
+
+    Chats are spread over sessions by consistent hashing, so adding an
+    account only moves the chats that land on it. Calls for a chat go to
+    a session that is admin there (recorded on the chat document as
+    `userbots`), preferring ones that are not in a FloodWait; another
+    session takes over while one is flood-limited.
+    """
+
+    def __init__(self, session_strings, replicas=None):
+        replicas = replicas or config.USERBOT_RING_REPLICAS
+        self.sessions = []
+        for index, session_string in enumerate(session_strings):
+            # Stable name: the ring must not reshuffle when the list is reordered
+            name = hashlib.md5(session_string.encode()).hexdigest()[:8]
+            self.sessions.append(UserBotClient(session_string, name=name, limiter=self._limiter(index, name)))
+        self._build_ring(replicas)
+        # chat_id -> userbot account ids that are admin there
+        self.admins = {}
+        # chat_id -> (session that joined it and awaits promotion, since)
+        self.joining = {}
+        # Awaited (as tasks) each time start() gets a session connected
+        self.connect_listeners = []
+
+    @staticmethod
+    def _limiter(index, name):
+        """Each account has its own flood limits, so its own limiter"""
+        if index == 0:
+            return userbot_limiter
+        return RateLimiter(config.USERBOT_GLOBAL_RATE, method_rates=METHOD_RATES, name=f"userbot_{name}")
+
+    def _build_ring(self, replicas):
+        self.ring = sorted(
+            (_ring_hash(f"{session.name}#{replica}"), index)
+            for index, session in enumerate(self.sessions)
+            for replica in range(replicas)
+        )
+        self.ring_keys = [key for key, _ in self.ring]
+
+    @property
+    def is_connected(self):
+        return any(session.is_connected for session in self.sessions)
+
+    @property
+    def primary(self):
+        return next((s for s in self.sessions if s.is_connected), self.sessions[0] if self.sessions else None)
+
+    async def start(self, clients=None):
+        """Start every session, or one per ready client (e.g. the emulator's)"""
+        if clients:
+            self.sessions = [
+                UserBotClient("", name=f"client{i}", limiter=self._limiter(i, f"client{i}"))
+                for i in range(len(clients))
+            ]
+            self._build_ring(config.USERBOT_RING_REPLICAS)
+        elif not self.sessions:
+            log.warning("No userbot session configured")
+            return False
+
+        await asyncio.gather(*(
+            session.start(clients[i] if clients else None, warm=False)
+            for i, session in enumerate(self.sessions)
+        ))
+        if not self.is_connected:
+            return False
+        await self.load_admins()
+        asyncio.create_task(self.warm_entity_cache())
+        log.info(f"Userbot pool started: {sum(s.is_connected for s in self.sessions)}/{len(self.sessions)} sessions")
+        for listener in self.connect_listeners:
+            asyncio.create_task(listener())
+        return True
+
+    def _legacy_session(self):
+        """The account chats were set up with before the pool existed"""
+        for session in self.sessions:
+            if config.SESSION_STRING and session.session_string == config.SESSION_STRING:
+                return session
+        return self.sessions[0] if self.sessions else None
+
+    async def load_admins(self):
+        by_user = {s.user_id for s in self.sessions if s.user_id}
+        legacy = self._legacy_session()
+        self.admins = {}
+        for chat in await db.get_userbot_assignments():
+            userbots = [uid for uid in chat.get("userbots") or [] if uid in by_user]
+            if not userbots and not chat.get("userbots") and chat.get("userbot_setup") and legacy and legacy.user_id:
+                # Set up before the pool existed; record the account so
+                # reordering USERBOT_SESSIONS later cannot move the chat
+                userbots = [legacy.user_id]
+                await db.add_chat_userbot(chat["chat_id"], legacy.user_id)
+            if userbots:
+                self.admins[int(chat["chat_id"])] = set(userbots)
+
+    def ring_order(self, chat_id):
+        """Sessions in ring order for a chat, its owner first"""
+        order = []
+        start = bisect.bisect(self.ring_keys, _ring_hash(str(int(chat_id))))
+        for offset in range(len(self.ring)):
+            index = self.ring[(start + offset) % len(self.ring)][1]
+            if index not in order:
+                order.append(index)
+                if len(order) == len(self.sessions):
+                    break
+        return [self.sessions[index] for index in order]
+
+    def candidates(self, chat_id):
+        """Connected sessions to try for a chat: admins first, healthy first"""
+        order = [s for s in self.ring_order(chat_id) if s.is_connected]
+        admins = self.admins.get(int(chat_id))
+        if admins:
+            order = [s for s in order if s.user_id in admins] or order
+        healthy = [s for s in order if not s.flooded()]
+        return healthy + sorted((s for s in order if s.flooded()), key=lambda s: s.flood_until)
+
+    def session_for(self, chat_id):
+        joining = self.joining.get(int(chat_id))
+        if joining is not None:
+            session, since = joining
+            if time.monotonic() - since < config.USERBOT_JOINING_TTL:
+                return session
+            # Never promoted: stop pinning the chat to a non-admin session
+            self.forget_joining(chat_id)
+        candidates = self.candidates(chat_id)
+        return candidates[0] if candidates else None
+
+    def forget_joining(self, chat_id):
+        self.joining.pop(int(chat_id), None)
+
+    async def mark_admin(self, chat_id, userbot_id):
+        """Remember that a userbot account was promoted in a chat"""
+        self.admins.setdefault(int(chat_id), set()).add(userbot_id)
+        self.forget_joining(chat_id)
+        await db.add_chat_userbot(chat_id, userbot_id)
+
+    def entity_stats(self):
+        stats = {"hits": 0, "misses": 0, "size": 0}
+        for session in self.sessions:
+            for key, value in session.entities.stats().items():
+                if key in stats:
+                    stats[key] += value
+        return stats
+
+    async def warm_entity_cache(self):
+        by_session = {}
+        for chat_id in await db.get_active_chat_ids("channel"):
+            session = self.session_for(chat_id)
+            if session:
+                by_session.setdefault(session, []).append(chat_id)
+        await asyncio.gather(*(s.warm_entity_cache(ids) for s, ids in by_session.items()))
+
+    async def get_userbot_info(self, chat_id: int = None):
+        """Info of the session serving `chat_id`, or of the first session"""
+        session = self.session_for(chat_id) if chat_id is not None else self.primary
+        return await session.get_userbot_info() if session else None
+
+    async def setup_channel(self, chat_id: int, invite_link: str = None):
+        """Join with the chat's ring owner (or the next healthy session)"""
+        candidates = self.candidates(chat_id)
+        if not candidates:
+            return False
+        session = candidates[0]
+        self.joining[int(chat_id)] = (session, time.monotonic())
+        joined = False
+        try:
+            joined = await session.setup_channel(chat_id, invite_link)
+        finally:
+            if not joined:
+                self.forget_joining(chat_id)
+        return joined
+
+    async def accept_join_request(self, chat_id: int, user_id: int):
+        flood = None
+        for session in self.candidates(chat_id):
+            try:
+                return await session.accept_join_request(chat_id, user_id)
+            except FloodWaitError as e:
+                flood = e
+        if flood:
+            raise flood
+        return False
+
+    async def accept_all_join_requests(self, chat_id: int, link: str = None):
+        candidates = self.candidates(chat_id)
+        for session in candidates:
+            last = session is candidates[-1]
+            if await session.accept_all_join_requests(chat_id, link, wait_out_floods=last):
+                return True
+            if not session.flooded():
+                return False
+        return False
+
+    async def invite_users(self, chat_id: int, user_ids, batch_size: int = None):
+        invited = []
+        remaining = list(user_ids)
+        candidates = self.candidates(chat_id)
+        for session in candidates:
+            last = session is candidates[-1]
+            done = await session.invite_users(chat_id, remaining, batch_size, wait_out_floods=last)
+            invited.extend(done)
+            if not session.flooded():
+                break
+            done = set(done)
+            remaining = [user_id for user_id in remaining if user_id not in done]
+        return invited
+
+    async def iter_join_requests(self, chat_id: int, cursor: dict = None, page_size: int = 100):
+        session = self.session_for(chat_id)
+        if session is None:
+            return
+        async for page in session.iter_join_requests(chat_id, cursor, page_size):
+            yield page
+
+    async def resolve_entity(self, chat_id: int):
+        return await self.session_for(chat_id).resolve_entity(chat_id)
+
+    def forget_entity(self, chat_id: int):
+        for session in self.sessions:
+            session.forget_entity(chat_id)
+
+    async def test_channel_access(self, chat_id: int):
+        session = self.session_for(chat_id)
+        return await session.test_channel_access(chat_id) if session else False
+
+    async def get_channel_info(self, chat_id: int):
+        session = self.session_for(chat_id)
+        return await session.get_channel_info(chat_id) if session else None
+
+    async def join_channel(self, chat_id: int, invite_link: str = None):
+        session = self.session_for(chat_id)
+        return await session.join_channel(chat_id, invite_link) if session else False
+
 # Global instance
-userbot_client = UserBotClient()
+userbot_client = UserBotPool(config.SESSION_STRINGS)
@@ -0,0 +1,46 @@
+import asyncio
+from utils.log import get_logger
+
+log = get_logger("background")
+
+class BackgroundJobs:
+    """Long owner jobs (Accept All, /reconcile, /audit) started from handlers.
+
+    Commands and callbacks are barriers for their chat in the
+    OrderedDispatcher, so a handler awaiting a minutes-long job would hold
+    up every later command in that chat. Handlers start the job here and
+    return; the job reports progress by editing its message. A key allows
+    one running job per key.
+    """
+
+    def __init__(self):
+        self.tasks = {}
+
+    def running(self, key):
+        task = self.tasks.get(key)
+        return task is not None and not task.done()
+
+    def start(self, key, coro):
+        """Run coro in the background, returns False if `key` is busy"""
+        if self.running(key):
+            coro.close()
+            return False
+        task = asyncio.create_task(coro)
+        self.tasks[key] = task
+        task.add_done_callback(lambda done: self._finished(key, done))
+        return True
+
+    def _finished(self, key, task):
+        if self.tasks.get(key) is task:
+            del self.tasks[key]
+        if not task.cancelled() and task.exception():
+            log.warning(f"Background job {key} failed: {task.exception()}")
+
+    async def stop(self):
+        tasks = list(self.tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+# Global instance
+jobs = BackgroundJobs()
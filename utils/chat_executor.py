@@ -0,0 +1,162 @@
+import asyncio
+from collections import deque
+from aiogram import Dispatcher
+from config import config
+from utils.metrics import queue_depth
+from utils.log import get_logger
+
+log = get_logger("chat_executor")
+
+# Update fields carrying the chat, in the order aiogram checks them
+CHAT_FIELDS = (
+    "message", "edited_message", "channel_post", "edited_channel_post",
+    "my_chat_member", "chat_member", "chat_join_request",
+)
+
+def update_chat_id(update):
+    """Chat an aiogram Update belongs to (the user's id for private ones)"""
+    for field in CHAT_FIELDS:
+        body = getattr(update, field, None)
+        if body is not None:
+            return body.chat.id
+    callback = update.callback_query
+    if callback is not None:
+        return callback.message.chat.id if callback.message else callback.from_user.id
+    for field in ("inline_query", "chosen_inline_result", "shipping_query", "pre_checkout_query"):
+        body = getattr(update, field, None)
+        if body is not None:
+            return body.from_user.id
+    return None
+
+class _ChatQueue:
+    __slots__ = ("items", "running", "wakeup", "task")
+
+    def __init__(self):
+        self.items = deque()
+        self.running = set()
+        self.wakeup = asyncio.Event()
+        self.task = None
+
+class ChatExecutor:
+    """Runs work keyed by chat: in order within a chat, in parallel across chats.
+
+    Items submitted with barrier=False (join requests) may overlap with
+    each other up to `chat_concurrency`; a barrier item waits for
+    everything before it in the same chat and holds back everything
+    after it. `concurrency` caps running items over all chats, and
+    `max_pending` bounds what may be queued before submit() waits.
+    A chat's queue is dropped after `idle_ttl` seconds without work.
+    """
+
+    def __init__(self, handle, concurrency=None, chat_concurrency=None, max_pending=None, idle_ttl=None):
+        self.handle = handle
+        self.chat_concurrency = chat_concurrency or config.UPDATE_CHAT_CONCURRENCY
+        self.idle_ttl = idle_ttl or config.UPDATE_IDLE_TTL
+        self.slots = asyncio.Semaphore(concurrency or config.UPDATE_CONCURRENCY)
+        self.room = asyncio.Semaphore(max_pending or config.UPDATE_QUEUE_SIZE)
+        self.chats = {}
+        self.pending = 0
+        self.idle = asyncio.Event()
+        self.idle.set()
+        queue_depth.set_function(lambda: self.pending, queue="updates")
+
+    async def submit(self, key, item, barrier=True):
+        await self.room.acquire()
+        self.pending += 1
+        self.idle.clear()
+        chat = self.chats.get(key)
+        if chat is None:
+            chat = self.chats[key] = _ChatQueue()
+            chat.task = asyncio.create_task(self._run_chat(key, chat))
+        chat.items.append((item, barrier))
+        chat.wakeup.set()
+
+    async def join(self):
+        """Wait until everything submitted so far has been handled"""
+        await self.idle.wait()
+
+    async def _run_chat(self, key, chat):
+        while True:
+            if not chat.items:
+                chat.wakeup.clear()
+                try:
+                    await asyncio.wait_for(chat.wakeup.wait(), self.idle_ttl)
+                except asyncio.TimeoutError:
+                    pass
+                if not chat.items and not chat.running:
+                    del self.chats[key]
+                    return
+                continue
+
+            item, barrier = chat.items[0]
+            if barrier or len(chat.running) >= self.chat_concurrency:
+                if chat.running:
+                    await asyncio.wait(chat.running, return_when=asyncio.ALL_COMPLETED if barrier else asyncio.FIRST_COMPLETED)
+                    continue
+            chat.items.popleft()
+            if barrier:
+                await self._run(item)
+            else:
+                task = asyncio.create_task(self._run(item))
+                chat.running.add(task)
+                task.add_done_callback(chat.running.discard)
+
+    async def _run(self, item):
+        try:
+            async with self.slots:
+                await self.handle(item)
+        except Exception as e:
+            log.exception("update handler failed", error=str(e))
+        finally:
+            self.room.release()
+            self.pending -= 1
+            if not self.pending:
+                self.idle.set()
+
+class OrderedDispatcher(Dispatcher):
+    """aiogram Dispatcher that hands updates to a ChatExecutor.
+
+    Polling and webhook intake return as soon as updates are queued, so a
+    burst in one chat never holds up the next batch for everyone else.
+    Join requests are independent of each other; every other update is
+    a barrier for its chat, e.g. the
+    bot being demoted after a join request. Long jobs started by commands
+    run in utils.background so they do not hold the barrier.
+
+    Batches are queued one at a time, in arrival order, so two batches
+    never interleave while submit() waits for room. aiogram 2 polling hands
+    every batch to a new task without waiting for it; start_polling()
+    holds the next getUpdates until the previous batch is queued, which
+    turns a full executor into backpressure on polling as well.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.executor = ChatExecutor(self.updates_handler.notify)
+        self.intake = asyncio.Lock()
+
+    async def process_updates(self, updates, fast: bool = True):
+        async with self.intake:
+            for update in updates:
+                await self.executor.submit(
+                    update_chat_id(update),
+                    update,
+                    barrier=update.chat_join_request is None
+                )
+        return []
+
+    async def start_polling(self, *args, **kwargs):
+        get_updates = self.bot.get_updates
+
+        async def paced_get_updates(*a, **kw):
+            # Let the batch task polling just created take the intake first
+            await asyncio.sleep(0)
+            async with self.intake:
+                pass
+            return await get_updates(*a, **kw)
+
+        self.bot.get_updates = paced_get_updates
+        try:
+            return await super().start_polling(*args, **kwargs)
+        finally:
+            del self.bot.get_updates
@@ -0,0 +1,169 @@
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from config import config
+
+trace_id_var = ContextVar("trace_id", default=None)
+span_var = ContextVar("span", default=None)
+
+_listener = None
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line, with the current trace id and extra fields"""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key in ("trace_id", "span"):
+            value = getattr(record, key, None)
+            if value:
+                entry[key] = value
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+class StructQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves formatting to the listener's JSONFormatter.
+
+    The stock prepare() bakes the traceback into msg and drops exc_info;
+    here the traceback is rendered into exc_text (the frames stay on this
+    side) and msg keeps only the message.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+class ContextFilter(logging.Filter):
+    """Stamp records with the trace/span of the code that logged them.
+
+    Runs on the calling side, before the record crosses to the listener
+    thread where the contextvars are no longer visible.
+    """
+
+    def filter(self, record):
+        record.trace_id = trace_id_var.get()
+        record.span = span_var.get()
+        return True
+
+class SamplingFilter(logging.Filter):
+    """Cap hot-path detail records (logged with sampled=True) per second.
+
+    Under LOG_SAMPLE_LIMIT records/s everything is kept; above it the rest
+    of the second is dropped and a one-line summary of how many were
+    suppressed is logged instead.
+    """
+
+    def __init__(self, limit_per_second):
+        super().__init__()
+        self.limit = limit_per_second
+        self.window = int(time.monotonic())
+        self.seen = 0
+        self.dropped = 0
+
+    def filter(self, record):
+        fields = getattr(record, "fields", {})
+        if not fields.pop("sampled", False):
+            return True
+
+        window = int(time.monotonic())
+        if window != self.window:
+            dropped, self.dropped = self.dropped, 0
+            self.window, self.seen = window, 0
+            if dropped:
+                logging.getLogger("log.sampling").info(
+                    "suppressed hot-path records", extra={"fields": {"dropped": dropped}}
+                )
+
+        self.seen += 1
+        if self.seen > self.limit:
+            self.dropped += 1
+            return False
+        return True
+
+class StructLogger(logging.LoggerAdapter):
+    """log.info("msg", key=value, ...) - keyword arguments become JSON fields"""
+
+    def process(self, msg, kwargs):
+        reserved = ("exc_info", "stack_info", "stacklevel", "extra")
+        fields = {key: kwargs.pop(key) for key in list(kwargs) if key not in reserved}
+        kwargs["extra"] = {"fields": fields}
+        return msg, kwargs
+
+def get_logger(name):
+    return StructLogger(logging.getLogger(name), {})
+
+def setup_logging(level=None):
+    """Route all logging through a queue to a background writer thread"""
+    global _listener
+    if _listener is not None:
+        return
+
+    log_queue = queue.Queue(-1)
+    queue_handler = StructQueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter())
+    queue_handler.addFilter(SamplingFilter(config.LOG_SAMPLE_LIMIT))
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(JSONFormatter())
+
+    root = logging.getLogger()
+    root.handlers[:] = [queue_handler]
+    root.setLevel(level or config.LOG_LEVEL)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+
+def stop_logging():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+def new_trace():
+    """Start a fresh trace in the current context, returns its id"""
+    trace_id = uuid.uuid4().hex[:16]
+    trace_id_var.set(trace_id)
+    return trace_id
+
+@contextmanager
+def span(name, logger=None, **fields):
+    """Time a block as a span of the current trace (starting one if needed)"""
+    trace_token = None
+    if trace_id_var.get() is None:
+        trace_token = trace_id_var.set(uuid.uuid4().hex[:16])
+    span_token = span_var.set(name)
+    started = time.monotonic()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        fields["duration_ms"] = round((time.monotonic() - started) * 1000, 2)
+        if error:
+            fields["error"] = error
+        (logger or get_logger("trace")).debug("span", sampled=True, **fields)
+        span_var.reset(span_token)
+        if trace_token is not None:
+            trace_id_var.reset(trace_token)
@@ -1,21 +1,113 @@
+import asyncio
 from config import config
+from utils.metrics import queue_depth
+from utils.log import get_logger
+
+log = get_logger("logger")
+
+# Telegram's limit for one message, the "📊 " prefix included
+MESSAGE_LIMIT = 4096
+PREFIX = "📊 "
 
 class Logger:
+    """Queued log sink for the owner / LOG_CHANNEL.
+
+    Nothing here waits on Telegram: log calls only enqueue, a background
+    task does the sending. Accepted requests are not sent one by one but
+    counted per chat and sent as one digest every LOG_DIGEST_INTERVAL.
+    """
     bot = None
-    
+    # Created in start(), inside the running loop
+    queue = None
+    # chat_id -> [title, count]
+    _accepted = {}
+    _tasks = []
+
     @classmethod
     def set_bot(cls, bot_instance):
         cls.bot = bot_instance
-    
+
     @classmethod
-    async def log_to_owner(cls, message: str):
-        if cls.bot and config.OWNER_ID:
+    def target(cls):
+        return config.LOG_CHANNEL or config.OWNER_ID
+
+    @classmethod
+    def start(cls):
+        if cls.queue is None:
+            cls.queue = asyncio.Queue(maxsize=config.LOG_QUEUE_SIZE)
+        queue_depth.set_function(cls.queue.qsize, queue="log")
+        if not cls._tasks:
+            cls._tasks = [
+                asyncio.create_task(cls._send_loop()),
+                asyncio.create_task(cls._digest_loop())
+            ]
+
+    @classmethod
+    async def stop(cls):
+        """Send the last digest and whatever is still queued"""
+        for task in cls._tasks:
+            task.cancel()
+        await asyncio.gather(*cls._tasks, return_exceptions=True)
+        cls._tasks = []
+
+        if cls.queue is None:
+            return
+        cls._queue_digest()
+        while not cls.queue.empty():
+            await cls._send(cls.queue.get_nowait())
+
+    @classmethod
+    def _enqueue(cls, message: str):
+        if cls.queue is None:
+            log.warning(f"Logger not started, dropped: {message}")
+            return
+        try:
+            cls.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            log.warning(f"Log queue full, dropped: {message}")
+
+    @classmethod
+    async def _send(cls, message: str):
+        if cls.bot and cls.target():
             try:
-                await cls.bot.send_message(config.OWNER_ID, f"📊 {message}")
-                print(f"✅ Log sent to owner: {message}")
+                text = f"{PREFIX}{message}"[:MESSAGE_LIMIT]
+                await cls.bot.send_message(cls.target(), text)
             except Exception as e:
-                print(f"❌ Logging error: {e}")
-    
+                log.warning(f"Logging error: {e}")
+
+    @classmethod
+    async def _send_loop(cls):
+        while True:
+            message = await cls.queue.get()
+            await cls._send(message)
+
+    @classmethod
+    def _queue_digest(cls):
+        if not cls._accepted:
+            return
+        counts, cls._accepted = cls._accepted, {}
+        ranked = sorted(counts.items(), key=lambda item: -item[1][1])
+        message = f"Last {config.LOG_DIGEST_INTERVAL}s:"
+        # Busiest chats first, as many as fit in one message with room for the footer
+        room = MESSAGE_LIMIT - len(PREFIX) - len(f"\n+{len(ranked)} more chats")
+        for shown, (chat_id, (chat_title, count)) in enumerate(ranked):
+            line = f"\n✅ {count} accepted in {chat_title} ({chat_id})"
+            if len(message) + len(line) > room:
+                message += f"\n+{len(ranked) - shown} more chats"
+                break
+            message += line
+        cls._enqueue(message)
+
+    @classmethod
+    async def _digest_loop(cls):
+        while True:
+            await asyncio.sleep(config.LOG_DIGEST_INTERVAL)
+            cls._queue_digest()
+
+    @classmethod
+    async def log_to_owner(cls, message: str):
+        cls._enqueue(message)
+
     @classmethod
     async def log_chat_added(cls, chat_title: str, added_by: int, chat_type: str):
         message = f"""
@@ -26,12 +118,14 @@ class Logger:
 **Added By:** {added_by}
 """
         await cls.log_to_owner(message)
-    
+
     @classmethod
-    async def log_request_accepted(cls, chat_title: str, username: str):
-        message = f"✅ Request accepted in {chat_title} for {username}"
-        await cls.log_to_owner(message)
-    
+    async def log_request_accepted(cls, chat_id: int, chat_title: str, username: str):
+        # Counted only; reported in the next digest
+        entry = cls._accepted.setdefault(chat_id, [chat_title, 0])
+        entry[0] = chat_title
+        entry[1] += 1
+
     @classmethod
     async def log_error(cls, error: str):
         message = f"❌ Error: {error}"
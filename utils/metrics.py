@@ -0,0 +1,162 @@
+import asyncio
+import functools
+import time
+from config import config
+from utils.log import get_logger
+
+log = get_logger("metrics")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+def _labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{value}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self.values = {}
+        registry.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        return [f"{self.name}{_labels(self.label_names, key)} {value}" for key, value in self.values.items()]
+
+class Gauge(Metric):
+    """Gauge read from callbacks at scrape time: set_function(fn, **labels)"""
+    kind = "gauge"
+
+    def set_function(self, fn, **labels):
+        self.values[self._key(labels)] = fn
+
+    def render(self):
+        lines = []
+        for key, fn in self.values.items():
+            try:
+                lines.append(f"{self.name}{_labels(self.label_names, key)} {fn()}")
+            except Exception:
+                pass
+        return lines
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = buckets
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        state = self.values.get(key)
+        if state is None:
+            state = self.values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                state["counts"][i] += 1
+        state["sum"] += value
+        state["count"] += 1
+
+    def render(self):
+        lines = []
+        names = self.label_names + ("le",)
+        for key, state in self.values.items():
+            for bound, count in zip(self.buckets, state["counts"]):
+                lines.append(f"{self.name}_bucket{_labels(names, key + (bound,))} {count}")
+            lines.append(f"{self.name}_bucket{_labels(names, key + ('+Inf',))} {state['count']}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {state['sum']}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {state['count']}")
+        return lines
+
+registry = []
+
+def render():
+    lines = []
+    for metric in registry:
+        lines.extend(metric.header())
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+def timed(histogram, **labels):
+    """Decorator: observe how long an async function takes"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            started = time.monotonic()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                histogram.observe(time.monotonic() - started, **labels)
+        return wrapper
+    return decorator
+
+# Approval pipeline
+approval_latency = Histogram(
+    "autoreq_approval_latency_seconds",
+    "Time from join request arrival to successful approval"
+)
+approvals = Counter("autoreq_approvals_total", "Approved join requests", ("chat_id",))
+join_requests = Counter("autoreq_join_requests_total", "Received join requests", ("chat_id",))
+
+# Backends
+mongo_op_seconds = Histogram("autoreq_mongo_op_seconds", "MongoDB operation time", ("method",))
+telegram_call_seconds = Histogram(
+    "autoreq_telegram_call_seconds", "Telegram API call time", ("transport", "method")
+)
+telegram_errors = Counter(
+    "autoreq_telegram_errors_total", "Failed Telegram API calls", ("transport", "method", "error")
+)
+
+# Internal queues
+queue_depth = Gauge("autoreq_queue_depth", "Items waiting in internal queues", ("queue",))
+
+def mongo_op(func):
+    """Time a MongoDB method under its own name"""
+    return timed(mongo_op_seconds, method=func.__name__)(func)
+
+async def _handle(reader, writer):
+    try:
+        request_line = await reader.readline()
+        # Drain headers, we only care about the path
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+        path = request_line.split(b" ")[1] if request_line.count(b" ") >= 2 else b""
+        if path.startswith(b"/metrics"):
+            status, body = "200 OK", render().encode()
+        else:
+            status, body = "404 Not Found", b"not found\n"
+        writer.write(
+            f"HTTP/1.1 {status}\r\n"
+            f"Content-Type: text/plain; version=0.0.4\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+    finally:
+        writer.close()
+
+async def start_server(host=None, port=None):
+    """Serve /metrics locally; disabled unless METRICS_PORT is set"""
+    port = config.METRICS_PORT if port is None else port
+    if not port:
+        return None
+    server = await asyncio.start_server(_handle, host or config.METRICS_HOST, port)
+    log.info(f"Metrics on http://{host or config.METRICS_HOST}:{port}/metrics")
+    return server
@@ -0,0 +1,166 @@
+import asyncio
+import functools
+import time
+from aiogram import Bot
+from aiogram.utils.exceptions import RetryAfter
+from config import config
+from utils.cache import TTLCache
+from utils.scheduler import LaneScheduler
+from utils.metrics import telegram_call_seconds, telegram_errors, queue_depth
+from utils.log import get_logger
+
+log = get_logger("rate_limiter")
+
+# Bot API methods that count against Telegram's ~1 msg/s per-chat limit
+CHAT_LIMITED_METHODS = {
+    "sendMessage", "editMessageText", "editMessageReplyMarkup",
+    "sendPhoto", "sendDocument", "forwardMessage", "copyMessage",
+}
+
+# Extra per-method budgets (calls/s) on top of the global one
+METHOD_RATES = {
+    "getChatMember": 10,
+    "promoteChatMember": 2,
+    "createChatInviteLink": 2,
+    "setChatAdministratorCustomTitle": 2,
+    # Telethon requests, keyed by TL class name
+    "InviteToChannelRequest": 1,
+    "ImportChatInviteRequest": 0.5,
+    "GetChatInviteImportersRequest": 2,
+}
+
+class TokenBucket:
+    """Token bucket that hands out reservations instead of refusing.
+
+    reserve() always takes a token and returns how long the caller must
+    wait for it, so concurrent callers queue up fairly. penalize() applies
+    a server-reported wait (429 / FloodWait) and halves the rate; every
+    granted reservation then creeps the rate back up to its base.
+    """
+
+    def __init__(self, rate, capacity=None, min_rate=0.1):
+        self.base_rate = rate
+        self.rate = rate
+        self.min_rate = min_rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def reserve(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        self.rate = min(self.base_rate, self.rate * 1.01)
+        return max(wait, self.blocked_until - now)
+
+    def penalize(self, seconds):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.rate = max(self.min_rate, self.rate / 2)
+        self.tokens = min(self.tokens, 0)
+
+class RateLimiter:
+    """Global, per-chat and per-method token buckets for one Telegram transport.
+
+    The global bucket is shared out between priority lanes by a
+    LaneScheduler (see utils.scheduler); callers pick their lane with
+    `with lane(...)`.
+    """
+
+    def __init__(self, global_rate, chat_rate=None, chat_methods=None, method_rates=None, name="bot"):
+        self.global_bucket = TokenBucket(global_rate)
+        self.scheduler = LaneScheduler(self.global_bucket)
+        for lane_name in self.scheduler.queues:
+            queue_depth.set_function(
+                functools.partial(self.scheduler.depth, lane_name),
+                queue=f"{name}_{lane_name}"
+            )
+        self.chat_rate = chat_rate
+        self.chat_methods = chat_methods
+        self.method_buckets = {
+            method: TokenBucket(rate) for method, rate in (method_rates or {}).items()
+        }
+        # Idle chat buckets simply expire
+        self.chat_buckets = TTLCache(maxsize=50000, ttl=600)
+
+    def _buckets(self, method, chat_id):
+        buckets = [self.global_bucket]
+        if method in self.method_buckets:
+            buckets.append(self.method_buckets[method])
+        if chat_id is not None and self.chat_rate and (
+                self.chat_methods is None or method in self.chat_methods):
+            bucket = self.chat_buckets.get(chat_id)
+            if bucket is None:
+                bucket = TokenBucket(self.chat_rate, capacity=3)
+                self.chat_buckets.set(chat_id, bucket)
+            buckets.append(bucket)
+        return buckets
+
+    async def acquire(self, method, chat_id=None):
+        # Narrow buckets first, then queue for the shared global budget
+        narrow = self._buckets(method, chat_id)[1:]
+        wait = max((bucket.reserve() for bucket in narrow), default=0.0)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        await self.scheduler.acquire()
+
+    def share(self, fraction):
+        """Keep only a fraction of the global and per-method budgets, for
+        when several worker processes send with the same bot token"""
+        for bucket in [self.global_bucket, *self.method_buckets.values()]:
+            bucket.base_rate = bucket.rate = bucket.base_rate * fraction
+            bucket.capacity = max(1.0, bucket.capacity * fraction)
+            bucket.tokens = min(bucket.tokens, bucket.capacity)
+
+    def backoff(self, method, chat_id, seconds):
+        """Learn from a 429 / FloodWait: the chat if one was involved, else everything"""
+        buckets = self._buckets(method, chat_id)
+        if len(buckets) == 1:
+            self.global_bucket.penalize(seconds)
+        for bucket in buckets[1:]:
+            bucket.penalize(seconds)
+
+class RateLimitedBot(Bot):
+    """aiogram Bot whose every API call goes through a RateLimiter.
+
+    All Bot methods funnel into request(), so handlers, services and
+    `update.approve()` are throttled without touching their code.
+    """
+
+    def __init__(self, *args, limiter=None, max_retries=3, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.limiter = limiter or bot_limiter
+        self.max_retries = max_retries
+
+    async def request(self, method, data=None, files=None, **kwargs):
+        chat_id = (data or {}).get("chat_id")
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.acquire(method, chat_id)
+            started = time.monotonic()
+            try:
+                return await super().request(method, data, files, **kwargs)
+            except Exception as e:
+                telegram_errors.inc(transport="bot", method=method, error=type(e).__name__)
+                if not isinstance(e, RetryAfter):
+                    raise
+                self.limiter.backoff(method, chat_id, e.timeout)
+                if attempt == self.max_retries:
+                    raise
+                log.warning(f"429 on {method}, retrying after {e.timeout}s")
+            finally:
+                telegram_call_seconds.observe(time.monotonic() - started, transport="bot", method=method)
+
+# Global instances, one per transport
+bot_limiter = RateLimiter(
+    config.BOT_GLOBAL_RATE,
+    chat_rate=config.BOT_CHAT_RATE,
+    chat_methods=CHAT_LIMITED_METHODS,
+    method_rates=METHOD_RATES
+)
+userbot_limiter = RateLimiter(
+    config.USERBOT_GLOBAL_RATE,
+    method_rates=METHOD_RATES,
+    name="userbot"
+)
@@ -0,0 +1,85 @@
+import asyncio
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Lanes for outbound Telegram work, most urgent first
+REALTIME = "realtime"        # join-request approvals
+INTERACTIVE = "interactive"  # replies to commands and button presses
+BULK = "bulk"                # Accept All, channel setup, audits, backfills
+
+LANE_WEIGHTS = {REALTIME: 8, INTERACTIVE: 4, BULK: 1}
+
+current_lane = ContextVar("current_lane", default=INTERACTIVE)
+
+@contextmanager
+def lane(name):
+    """Run the enclosed calls (and tasks created inside) in a lane"""
+    token = current_lane.set(name)
+    try:
+        yield
+    finally:
+        current_lane.reset(token)
+
+class LaneScheduler:
+    """Weighted fair queuing of callers in front of a shared TokenBucket.
+
+    Each lane gets a share of the bucket proportional to its weight while
+    it has waiters, so a bulk job can use the whole budget when nothing
+    else is happening but never starves approvals or the dashboard.
+    """
+
+    def __init__(self, bucket, weights=None):
+        self.bucket = bucket
+        self.weights = weights or LANE_WEIGHTS
+        self.queues = {name: deque() for name in self.weights}
+        self.last_finish = dict.fromkeys(self.weights, 0.0)
+        self.virtual_time = 0.0
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def depth(self, name=None):
+        if name:
+            return len(self.queues[name])
+        return sum(len(queue) for queue in self.queues.values())
+
+    async def acquire(self, name=None):
+        name = name or current_lane.get()
+        waiter = asyncio.get_running_loop().create_future()
+        # Finish tag is fixed on arrival: a lane that keeps waiting is not
+        # pushed back by the virtual time other lanes advance
+        finish = max(self.virtual_time, self.last_finish[name]) + 1 / self.weights[name]
+        self.last_finish[name] = finish
+        self.queues[name].append((finish, waiter))
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._dispatch())
+        self._wakeup.set()
+        await waiter
+
+    def _pick(self):
+        for queue in self.queues.values():
+            while queue and queue[0][1].done():
+                queue.popleft()  # cancelled waiter
+        ready = [name for name, queue in self.queues.items() if queue]
+        if not ready:
+            return None
+        return min(ready, key=lambda name: self.queues[name][0][0])
+
+    async def _dispatch(self):
+        while True:
+            if self._pick() is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            wait = self.bucket.reserve()
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+            # Pick again: something more urgent may have arrived meanwhile
+            name = self._pick()
+            if name is None:
+                continue
+            finish, waiter = self.queues[name].popleft()
+            self.virtual_time = finish - 1 / self.weights[name]
+            waiter.set_result(None)
@@ -0,0 +1,133 @@
+import asyncio
+import hmac
+import multiprocessing
+import queue
+from aiohttp import web
+from aiogram import types
+from utils.log import get_logger
+
+log = get_logger("webhook")
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+# Handled in worker 0, the only process that runs the userbot session
+# (and holds the permission cache these updates keep current)
+USERBOT_UPDATES = {"my_chat_member"}
+
+_tasks = set()
+
+def chat_of(update: dict):
+    """(update kind, chat id, chat type) of a raw update"""
+    for kind, body in update.items():
+        if not isinstance(body, dict):
+            continue
+        chat = body.get("chat") or (body.get("message") or {}).get("chat")
+        if chat:
+            return kind, chat.get("id"), chat.get("type")
+        user = body.get("from")
+        if user:
+            return kind, user.get("id"), "private"
+    return None, None, None
+
+def worker_for(update: dict, workers: int):
+    """Worker index for an update; one chat always lands on the same worker.
+
+    Private chats (commands, buttons) and bot-added events go to worker 0
+    because they drive the userbot, which can only be logged in once.
+    """
+    if workers <= 1:
+        return 0
+    kind, chat_id, chat_type = chat_of(update)
+    if chat_id is None or chat_type == "private" or kind in USERBOT_UPDATES:
+        return 0
+    return abs(int(chat_id)) % workers
+
+def process_in_background(dp, update: dict):
+    """Hand a raw update to the dispatcher without waiting for the handlers"""
+    if dp.executor.room.locked():
+        return False
+    task = asyncio.create_task(dp.process_updates([types.Update.to_object(update)]))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return True
+
+async def consume(updates, dp):
+    """Worker side: feed updates from the front process until it sends None"""
+    loop = asyncio.get_running_loop()
+    while True:
+        update = await loop.run_in_executor(None, updates.get)
+        if update is None:
+            break
+        # Waits while the dispatcher's executor is full: backpressure
+        await dp.process_updates([types.Update.to_object(update)])
+    if _tasks:
+        await asyncio.gather(*_tasks, return_exceptions=True)
+    await dp.executor.join()
+
+class WorkerPool:
+    """Worker processes, each with its own update queue"""
+
+    def __init__(self, target, workers, queue_size):
+        # spawn, not fork: the parent already holds Mongo and HTTP clients
+        context = multiprocessing.get_context("spawn")
+        self.queues = [context.Queue(maxsize=queue_size) for _ in range(workers)]
+        self.processes = [
+            context.Process(target=target, args=(index, updates), name=f"autoreq-worker-{index}")
+            for index, updates in enumerate(self.queues)
+        ]
+
+    def start(self):
+        for process in self.processes:
+            process.start()
+        log.info(f"Started {len(self.processes)} update workers")
+
+    def dispatch(self, update: dict):
+        index = worker_for(update, len(self.queues))
+        if not self.processes[index].is_alive():
+            log.error("update worker is down", worker=index)
+            return False
+        try:
+            self.queues[index].put_nowait(update)
+            return True
+        except queue.Full:
+            return False
+
+    def stop(self, timeout=30):
+        for updates in self.queues:
+            try:
+                updates.put(None, timeout=timeout)
+            except queue.Full:
+                pass
+        for process in self.processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+
+class WebhookServer:
+    """Receives updates from Telegram and passes them to `dispatch`.
+
+    dispatch(update) returns False when the update can't be taken right
+    now; Telegram then gets a 503 and redelivers it later.
+    """
+
+    def __init__(self, path, secret="", dispatch=None):
+        self.path = path
+        self.secret = secret
+        self.dispatch = dispatch
+
+    async def handle(self, request):
+        if self.secret and not hmac.compare_digest(request.headers.get(SECRET_HEADER, ""), self.secret):
+            log.warning("webhook call with a bad secret token", remote=request.remote)
+            return web.Response(status=401)
+        try:
+            update = await request.json()
+        except Exception:
+            return web.Response(status=400)
+        if not self.dispatch(update):
+            return web.Response(status=503, headers={"Retry-After": "1"})
+        return web.Response(text="ok")
+
+    def app(self):
+        app = web.Application()
+        app.router.add_post(self.path, self.handle)
+        return app